@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from budget_index import budget_index
+from cache import read_cache
+from config import SQLITE_PRAGMAS
+from database import Base, new_session, apply_sqlite_pragmas, AccountOrm, BudgetOrm
+from repository import UserRepository, AccountRepository, CategoryRepository, BudgetRepository
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd, SBudgetAdd
+
+# Обновление wasted бюджетов, покрывающих дату транзакции: прежний UPDATE по диапазону дат
+# (индекс account_id, date, target_date) против индекса окон в памяти и UPDATE по id.
+# У счета --months месячных бюджетов и перекрывающие их годовые.
+# Запуск: python -m benchmarks.budget_windows [--months 120] [--iterations 2000] [--covered 0.5]
+
+# Обе схемы, как при записи расхода: UPDATE баланса счета с RETURNING владельца (и ревизии бюджетов),
+# затем UPDATE покрывающих бюджетов; без покрывающих бюджетов индекс обходится без второго запроса
+async def range_update(session, account_id: int, day: date):
+    await session.execute(
+        update(AccountOrm).where(AccountOrm.id == account_id).values(balance=AccountOrm.balance - 1)
+        .returning(AccountOrm.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(
+        update(BudgetOrm)
+        .where(BudgetOrm.account_id == account_id, BudgetOrm.date <= day, BudgetOrm.target_date >= day)
+        .values(wasted=BudgetOrm.wasted + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+async def index_update(session, account_id: int, day: date):
+    _, revision = (await session.execute(
+        update(AccountOrm).where(AccountOrm.id == account_id).values(balance=AccountOrm.balance - 1)
+        .returning(AccountOrm.user_id, AccountOrm.budgets_revision)
+        .execution_options(synchronize_session=False)
+    )).first()
+    budget_ids = await budget_index.covering(session, account_id, revision, day)
+    if budget_ids:
+        await session.execute(
+            update(BudgetOrm)
+            .where(BudgetOrm.id.in_(budget_ids))
+            .values(wasted=BudgetOrm.wasted + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+async def measure(step, days: list[date]) -> dict:
+    latencies = []
+    async with new_session() as session:
+        for day in days:
+            started = time.perf_counter()
+            await step(session, 1, day)
+            latencies.append((time.perf_counter() - started) * 1_000_000)
+        await session.rollback()
+    return {"p50_us": round(statistics.median(latencies), 1),
+            "p95_us": round(statistics.quantiles(latencies, n=100)[94], 1)}
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months", type=int, default=120)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--covered", type=float, default=0.5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    read_cache.enabled = False
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    apply_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    new_session.configure(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await UserRepository.add_user(SUserAdd(name="bench", login="bench", email="bench@example.com",
+                                           password="bench", code="0000"))
+    await AccountRepository.add_account(SAccountAdd(name="bench", balance=0, user_id=1))
+    await CategoryRepository.add_category(SCategoryAdd(name="bench"))
+
+    start = date.today().replace(day=1)
+    for _ in range(args.months):
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        await BudgetRepository.add_budget(SBudgetAdd(name="month", amount=1000, wasted=0, date=start,
+                                                     target_date=end, user_id=1, account_id=1))
+        if start.month == 1:
+            await BudgetRepository.add_budget(SBudgetAdd(name="year", amount=12000, wasted=0, date=start,
+                                                         target_date=start.replace(month=12, day=31),
+                                                         user_id=1, account_id=1))
+        start = (start - timedelta(days=1)).replace(day=1)
+
+    # Даты транзакций: --covered доля внутри периода бюджетов, остальные раньше него
+    span = (date.today() - start).days
+    days = [start + timedelta(days=random.randint(0, span) if random.random() < args.covered else -random.randint(1, span))
+            for _ in range(args.iterations)]
+    # Первый проход прогревает кэш SQL и индекс окон; схемы чередуются, из двух раундов берется лучший,
+    # чтобы порядок запуска не влиял на результат
+    for step in (range_update, index_update):
+        await measure(step, days[:100])
+    results = {"budgets": args.months + args.months // 12, "covered": args.covered}
+    for step in (range_update, index_update, range_update, index_update):
+        result = await measure(step, days)
+        best = results.get(step.__name__)
+        if best is None or result["p50_us"] < best["p50_us"]:
+            results[step.__name__] = result
+    print(results)
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
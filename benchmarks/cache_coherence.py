@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+import sys
+
+from cache import ReadCache, MemoryCacheBackend, RedisCacheBackend
+
+# Проверка согласованности кэша между воркерами: два экземпляра ReadCache со своими клиентами
+# (как два процесса uvicorn). Воркер A кэширует значение, воркер B сбрасывает тег после записи,
+# и A должен получить промах. Для memory ожидается устаревшее значение, для redis - промах.
+# Запуск: python -m benchmarks.cache_coherence [--redis-url redis://localhost:6379/0]
+# Без --redis-url используется локальная замена Redis из пакета fakeredis (requirements-dev.txt).
+
+async def check(worker_a: ReadCache, worker_b: ReadCache) -> bool:
+    key, tags = "AccountRepository.get_account_by_id(('account_id', 1),)", ("account:1",)
+
+    found, value, versioned_key = await worker_a.get(key, tags)
+    await worker_a.set(versioned_key, {"balance": 100})
+    found, value, versioned_key = await worker_a.get(key, tags)
+    assert found and value == {"balance": 100}
+
+    await worker_b.invalidate("account:1")
+    found, value, versioned_key = await worker_a.get(key, tags)
+    return not found
+
+def redis_clients(url):
+    if url:
+        return RedisCacheBackend(url, prefix="coherence:"), RedisCacheBackend(url, prefix="coherence:")
+    import fakeredis
+    server = fakeredis.FakeServer()
+    return (RedisCacheBackend(client=fakeredis.FakeAsyncRedis(server=server), prefix="coherence:"),
+            RedisCacheBackend(client=fakeredis.FakeAsyncRedis(server=server), prefix="coherence:"))
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    memory_coherent = await check(ReadCache(MemoryCacheBackend(), enabled=True),
+                                  ReadCache(MemoryCacheBackend(), enabled=True))
+    print({"backend": "memory", "coherent": memory_coherent})
+
+    backend_a, backend_b = redis_clients(args.redis_url)
+    await backend_a.clear()
+    redis_coherent = await check(ReadCache(backend_a, enabled=True), ReadCache(backend_b, enabled=True))
+    print({"backend": "redis", "coherent": redis_coherent})
+    await backend_a.clear()
+    await backend_a.close()
+    await backend_b.close()
+
+    return 0 if redis_coherent else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from cache import read_cache
+from config import SQLITE_PRAGMAS
+from database import Base, new_session, apply_sqlite_pragmas
+from main import app
+from repository import (UserRepository, AccountRepository, CategoryRepository, BudgetRepository,
+                        FinancialGoalRepository, TransactionRepository)
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd, SBudgetAdd, SFinancialGoalAdd, STransactionAdd
+
+# Сравнение задержки открытия главного экрана: шесть последовательных запросов клиента
+# против одного /users/{id}/dashboard. Запросы идут в приложение в процессе (httpx ASGITransport),
+# сетевая задержка мобильного клиента моделируется паузой --rtt-ms на каждый HTTP-запрос.
+# Кэш чтения выключен, чтобы сравнивались запросы к БД.
+# Запуск: python -m benchmarks.dashboard [--iterations 200] [--rtt-ms 0,50] [--transactions 5000]
+
+USER_ID = 1
+ACCOUNTS = 5
+CATEGORIES = 10
+
+SEQUENTIAL_URLS = [
+    f"/accounts/user/{USER_ID}",
+    f"/accounts/total_balance/user/{USER_ID}",
+    f"/budgets/{USER_ID}",
+    f"/financial-goals/{USER_ID}/false",
+    f"/transactions/user/{USER_ID}/income/Month",
+    f"/transactions/user/{USER_ID}/expense/Month",
+]
+
+async def seed(transactions: int):
+    await UserRepository.add_user(SUserAdd(name="bench", login="bench", email="bench@example.com",
+                                           password="bench", code="0000"))
+    for index in range(CATEGORIES):
+        await CategoryRepository.add_category(SCategoryAdd(name=f"category {index}"))
+    for index in range(ACCOUNTS):
+        await AccountRepository.add_account(SAccountAdd(name=f"account {index}", balance=0, user_id=USER_ID))
+        await BudgetRepository.add_budget(SBudgetAdd(name=f"budget {index}", amount=1000, wasted=0,
+                                                     date=date.today().replace(day=1),
+                                                     target_date=date.today() + timedelta(days=30),
+                                                     user_id=USER_ID, account_id=index + 1))
+        await FinancialGoalRepository.add_financial_goal(SFinancialGoalAdd(
+            name=f"goal {index}", desc=None, amount=0, target_amount=1000, target_date=None, is_done=False,
+            user_id=USER_ID
+        ))
+    await TransactionRepository.add_transactions_bulk([
+        STransactionAdd(name="bench", description="", amount=round(random.uniform(1, 100), 2),
+                        date=date.today() - timedelta(days=random.randint(0, 60)), income=random.random() < 0.3,
+                        account_id=random.randint(1, ACCOUNTS), category_id=random.randint(1, CATEGORIES))
+        for _ in range(transactions)
+    ])
+
+async def request(client: httpx.AsyncClient, url: str, rtt: float):
+    if rtt:
+        await asyncio.sleep(rtt)
+    response = await client.get(url)
+    # Пустые сводки отвечают 404, это часть обычного сценария
+    assert response.status_code in (200, 404), (url, response.status_code)
+
+async def sequential(client: httpx.AsyncClient, rtt: float):
+    for url in SEQUENTIAL_URLS:
+        await request(client, url, rtt)
+
+async def dashboard(client: httpx.AsyncClient, rtt: float):
+    await request(client, f"/users/{USER_ID}/dashboard", rtt)
+
+async def measure(flow, client: httpx.AsyncClient, rtt: float, iterations: int) -> dict:
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await flow(client, rtt)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(statistics.quantiles(latencies, n=100)[94], 2),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--rtt-ms", default="0,50")
+    parser.add_argument("--transactions", type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    read_cache.enabled = False
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    apply_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    new_session.configure(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await seed(args.transactions)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for rtt_ms in (float(value) for value in args.rtt_ms.split(",")):
+            print({
+                "rtt_ms": rtt_ms,
+                "sequential": await measure(sequential, client, rtt_ms / 1000, args.iterations),
+                "dashboard": await measure(dashboard, client, rtt_ms / 1000, args.iterations),
+            })
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
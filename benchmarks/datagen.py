@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import calendar
+import itertools
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import case, column, func, insert, select, table, update
+
+from database import Base, create_engine_from_url, AccountOrm, BudgetOrm, TransactionOrm
+from migrations import apply_migrations
+from rollups import rebuild_statements
+
+# Генератор синтетических данных для нагрузочных тестов: пользователи, счета, категории, бюджеты,
+# цели и миллионы транзакций с правдоподобным распределением по датам. Балансы счетов, потраченное
+# по бюджетам и transaction_rollups пересчитываются по сгенерированным транзакциям, как их
+# поддерживает репозиторий. Заполняется только пустая база.
+# Запуск: python -m benchmarks.datagen --database-url sqlite+aiosqlite:///bench.db [--transactions 1000000]
+
+CATEGORY_NAMES = [
+    "Продукты", "Кафе и рестораны", "Транспорт", "Такси", "ЖКХ", "Связь", "Одежда", "Здоровье", "Аптеки",
+    "Развлечения", "Подписки", "Путешествия", "Образование", "Подарки", "Дом и ремонт", "Красота",
+    "Спорт", "Животные", "Дети", "Автомобиль", "Зарплата", "Подработка", "Кэшбэк", "Проценты по вкладу",
+]
+
+# Вставка без TypeDecorator: суммы генерируются сразу в копейках, как они хранятся в БД
+transactions_table = table("transactions", column("name"), column("description"), column("amount"),
+                           column("date"), column("income"), column("account_id"), column("category_id"))
+
+# Вес дня недели (пн..вс): расходов в выходные больше
+WEEKDAY_WEIGHTS = (0.8, 0.8, 0.9, 0.9, 1.1, 1.5, 1.3)
+# Дни выплаты зарплаты и аванса
+PAYDAYS = (5, 20)
+INCOME_SHARE = 0.08
+
+def zipf_cum_weights(size: int, exponent: float = 1.1) -> list[float]:
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, size + 1)))
+
+def payday(day: date, today: date) -> date:
+    # Ближайший не будущий день выплаты в том же месяце, иначе в предыдущем
+    for payday_number in reversed(PAYDAYS):
+        candidate = day.replace(day=payday_number)
+        if candidate <= day and candidate <= today:
+            return candidate
+    previous_month = day.replace(day=1) - timedelta(days=1)
+    return previous_month.replace(day=PAYDAYS[-1])
+
+def split_counts(total: int, weights: list[float]) -> list[int]:
+    weight_sum = sum(weights)
+    counts = [int(total * weight / weight_sum) for weight in weights]
+    for index in range(total - sum(counts)):
+        counts[index % len(counts)] += 1
+    return counts
+
+def transaction_rows(rng: random.Random, accounts: list[tuple[int, int, date]], categories: int,
+                     expense_categories: int, total: int, today: date):
+    # Активность пользователей сильно различается: веса счетов распределены логнормально
+    counts = split_counts(total, [rng.lognormvariate(0, 1) for _ in accounts])
+    expense_weights = zipf_cum_weights(expense_categories)
+    income_categories = list(range(expense_categories + 1, categories + 1))
+
+    for (account_id, user_id, opened), count in zip(accounts, counts):
+        span = (today - opened).days
+        for _ in range(count):
+            # Отклонение по дню недели: больше операций в выходные
+            while True:
+                day = opened + timedelta(days=rng.randint(0, span))
+                if rng.random() * max(WEEKDAY_WEIGHTS) < WEEKDAY_WEIGHTS[day.weekday()]:
+                    break
+            if rng.random() < INCOME_SHARE:
+                yield {
+                    "name": "Поступление", "description": "", "income": True,
+                    "amount": round(rng.lognormvariate(10.5, 0.5) * 100),
+                    "date": max(payday(day, today), opened),
+                    "account_id": account_id, "category_id": rng.choice(income_categories),
+                }
+            else:
+                category_id = rng.choices(range(1, expense_categories + 1), cum_weights=expense_weights)[0]
+                yield {
+                    "name": CATEGORY_NAMES[category_id - 1], "description": "", "income": False,
+                    "amount": round(rng.lognormvariate(6.5, 1.2) * 100) + 1,
+                    "date": day,
+                    "account_id": account_id, "category_id": category_id,
+                }
+
+def month_windows(today: date, months: int) -> list[tuple[date, date]]:
+    windows = []
+    start = today.replace(day=1)
+    for _ in range(months):
+        end = start.replace(day=calendar.monthrange(start.year, start.month)[1])
+        windows.append((start, end))
+        start = (start - timedelta(days=1)).replace(day=1)
+    return windows
+
+async def generate(database_url: str, users: int = 1000, accounts_per_user: int = 3, categories: int = 20,
+                   transactions: int = 1_000_000, days: int = 730, budget_months: int = 12,
+                   goals_per_user: int = 2, batch_size: int = 20_000, seed: int = 42, echo: bool = False) -> dict:
+    rng = random.Random(seed)
+    today = date.today()
+    started = time.perf_counter()
+    categories = min(categories, len(CATEGORY_NAMES))
+    # Последние четыре категории - доходные
+    expense_categories = max(categories - 4, 1)
+
+    engine = create_engine_from_url(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(apply_migrations, True)
+        existing = (await conn.execute(select(func.count()).select_from(TransactionOrm))).scalar()
+        if existing:
+            await engine.dispose()
+            raise SystemExit(f"В базе уже есть {existing} транзакций, генератор заполняет только пустую базу")
+
+        await conn.execute(insert(Base.metadata.tables["users"]), [
+            {"name": f"Пользователь {index}", "login": f"user{index}", "email": f"user{index}@example.com",
+             "password": "password", "code": "0000"}
+            for index in range(1, users + 1)
+        ])
+        await conn.execute(insert(Base.metadata.tables["categories"]), [
+            {"name": name} for name in CATEGORY_NAMES[:categories]
+        ])
+
+        # Пользователи подключаются в разное время: счет открыт в случайный день первых трех четвертей периода
+        accounts = []
+        for user_id in range(1, users + 1):
+            joined = today - timedelta(days=rng.randint(days // 4, days))
+            for index in range(accounts_per_user):
+                opened = min(joined + timedelta(days=rng.randint(0, 30) * index), today)
+                accounts.append((len(accounts) + 1, user_id, opened))
+        await conn.execute(insert(Base.metadata.tables["accounts"]), [
+            {"name": f"Счет {account_id}", "balance": 0, "user_id": user_id}
+            for account_id, user_id, _ in accounts
+        ])
+
+        windows = month_windows(today, budget_months)
+        await conn.execute(insert(Base.metadata.tables["budgets"]), [
+            {"name": f"Бюджет {start:%m.%Y}", "amount": rng.randint(20, 150) * 1000, "wasted": 0,
+             "date": start, "target_date": end, "user_id": user_id, "account_id": account_id}
+            for account_id, user_id, _ in accounts[::accounts_per_user]
+            for start, end in windows
+        ])
+        await conn.execute(insert(Base.metadata.tables["financial_goals"]), [
+            {"name": f"Цель {index}", "desc": None, "amount": rng.randint(0, 100) * 1000,
+             "target_amount": rng.randint(100, 1000) * 1000, "target_date": None,
+             "is_done": rng.random() < 0.2, "user_id": user_id}
+            for user_id in range(1, users + 1)
+            for index in range(goals_per_user)
+        ])
+
+        rows = transaction_rows(rng, accounts, categories, expense_categories, transactions, today)
+        inserted = 0
+        while batch := list(itertools.islice(rows, batch_size)):
+            await conn.execute(insert(transactions_table), batch)
+            inserted += len(batch)
+            if echo:
+                print(f"\rТранзакций: {inserted}/{transactions}", end="", flush=True)
+        if echo:
+            print()
+
+        # Производные данные, которые при обычной работе поддерживает репозиторий
+        signed_amount = func.sum(case((TransactionOrm.income, TransactionOrm.amount), else_=-TransactionOrm.amount))
+        await conn.execute(update(AccountOrm).values(balance=func.coalesce(
+            select(signed_amount).where(TransactionOrm.account_id == AccountOrm.id).scalar_subquery(), 0
+        )).execution_options(synchronize_session=False))
+        await conn.execute(update(BudgetOrm).values(wasted=func.coalesce(
+            select(func.sum(TransactionOrm.amount)).where(
+                TransactionOrm.account_id == BudgetOrm.account_id,
+                TransactionOrm.income.is_(False),
+                TransactionOrm.date.between(BudgetOrm.date, BudgetOrm.target_date),
+            ).scalar_subquery(), 0
+        )).execution_options(synchronize_session=False))
+        for statement in rebuild_statements():
+            await conn.execute(statement)
+    await engine.dispose()
+
+    return {
+        "users": users,
+        "accounts": len(accounts),
+        "categories": categories,
+        "budgets": len(windows) * users,
+        "financial_goals": goals_per_user * users,
+        "transactions": inserted,
+        "days": days,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///bench.db")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--accounts-per-user", type=int, default=3)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--budget-months", type=int, default=12)
+    parser.add_argument("--goals-per-user", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(await generate(args.database_url, args.users, args.accounts_per_user, args.categories,
+                         args.transactions, args.days, args.budget_months, args.goals_per_user,
+                         seed=args.seed, echo=True))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+from sqlalchemy import select, func
+
+from benchmarks.datagen import generate
+from cache import read_cache
+from config import METRICS_ENABLED
+from database import create_engine_from_url, new_session, AccountOrm, CategoryOrm, TransactionOrm
+from main import app
+from metrics import instrument_engine
+
+# Нагрузочный прогон основных эндпоинтов настоящего приложения в процессе (httpx ASGITransport):
+# для каждого сценария --requests запросов в --concurrency параллельных клиентов, результат -
+# пропускная способность и p50/p95/p99 в JSON. С --baseline сравнивает с сохраненным прогоном
+# и завершается с кодом 1 при регрессии больше --tolerance.
+# Без --database-url данные генерируются во временную базу (см. benchmarks.datagen).
+# Запуск: python -m benchmarks.load_test [--database-url URL] [--output result.json] [--baseline base.json]
+
+class Dataset:
+    def __init__(self, accounts: dict[int, list[int]], categories: int, transactions: int):
+        # Счета по пользователям; запросы пользователя идут к его собственным счетам
+        self.accounts = accounts
+        self.users = list(accounts)
+        self.categories = categories
+        self.transactions = transactions
+
+    def user(self, rng: random.Random) -> int:
+        return rng.choice(self.users)
+
+    def account(self, rng: random.Random) -> int:
+        return rng.choice(self.accounts[self.user(rng)])
+
+    def transaction(self, rng: random.Random) -> int:
+        return rng.randint(1, self.transactions)
+
+async def load_dataset() -> Dataset:
+    async with new_session() as session:
+        accounts = {}
+        for account_id, user_id in (await session.execute(select(AccountOrm.id, AccountOrm.user_id))).all():
+            accounts.setdefault(user_id, []).append(account_id)
+        categories = (await session.execute(select(func.count()).select_from(CategoryOrm))).scalar()
+        transactions = (await session.execute(select(func.max(TransactionOrm.id)))).scalar() or 0
+    return Dataset(accounts, categories, transactions)
+
+def transaction_body(dataset: Dataset, rng: random.Random) -> dict:
+    return {
+        "name": "load test", "description": "", "amount": round(rng.uniform(1, 5000), 2),
+        "date": (date.today() - timedelta(days=rng.randint(0, 60))).isoformat(), "income": rng.random() < 0.1,
+        "account_id": dataset.account(rng), "category_id": rng.randint(1, dataset.categories),
+    }
+
+# Сценарий: (метод, URL, тело) по генератору случайных чисел клиента. Пустые выборки отвечают 404,
+# это обычный ответ API, ошибкой считается только 5xx и неожиданные 4xx.
+SCENARIOS = {
+    "dashboard": lambda d, r: ("GET", f"/users/{d.user(r)}/dashboard", None),
+    "accounts_by_user": lambda d, r: ("GET", f"/accounts/user/{d.user(r)}", None),
+    "total_balance": lambda d, r: ("GET", f"/accounts/total_balance/user/{d.user(r)}", None),
+    "budgets_by_user": lambda d, r: ("GET", f"/budgets/{d.user(r)}", None),
+    "financial_goals_by_user": lambda d, r: ("GET", f"/financial-goals/{d.user(r)}/false", None),
+    "transactions_by_account": lambda d, r: ("GET", f"/transactions/account/{d.account(r)}", None),
+    "transactions_page": lambda d, r: ("GET", f"/transactions?limit=100&cursor={d.transaction(r)}", None),
+    "transactions_batch": lambda d, r: (
+        "GET", "/transactions?ids=" + ",".join(str(d.transaction(r)) for _ in range(20)), None
+    ),
+    "transaction_detail": lambda d, r: ("GET", f"/transactions/detail/{d.transaction(r)}", None),
+    "expense_by_category_month": lambda d, r: ("GET", f"/transactions/user/{d.user(r)}/expense/Month", None),
+    "income_by_category_year": lambda d, r: ("GET", f"/transactions/user/{d.user(r)}/income/Year", None),
+    "export_account_csv": lambda d, r: ("GET", f"/transactions/export/account/{d.account(r)}?format=csv", None),
+    "add_transaction": lambda d, r: ("POST", "/transactions/add", transaction_body(d, r)),
+    "update_transaction": lambda d, r: (
+        "PUT", f"/transactions/update/{d.transaction(r)}", transaction_body(d, r)
+    ),
+}
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    # Метод ближайшего ранга
+    index = max(int(len(sorted_values) * percent / 100 + 0.999999) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+async def run_scenario(client: httpx.AsyncClient, dataset: Dataset, name: str, requests: int,
+                       concurrency: int, seed: int) -> dict:
+    build = SCENARIOS[name]
+    latencies = []
+    errors = {}
+    remaining = iter(range(requests))
+
+    async def worker(worker_id: int):
+        rng = random.Random(f"{seed}:{name}:{worker_id}")
+        for _ in remaining:
+            method, url, body = build(dataset, rng)
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code not in (200, 404):
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+# Регрессия: p95 вырос или пропускная способность упала больше чем на tolerance
+def find_regressions(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, current in result["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} мс")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {previous['throughput_rps']} -> {current['throughput_rps']} запросов/с")
+        if current["errors"] and not previous["errors"]:
+            regressions.append(f"{name}: ошибки {current['errors']}")
+    return regressions
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", help="База, заполненная benchmarks.datagen; по умолчанию временная")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--no-cache", action="store_true", help="Выключить кэш чтения")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Файл для результата в JSON (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="Результат прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - SCENARIOS.keys()
+    if unknown:
+        parser.error(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+    database_url = args.database_url
+    generated = None
+    if database_url is None:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'load_test.db')}"
+        generated = await generate(database_url, users=args.users, transactions=args.transactions, seed=args.seed)
+        print(f"Сгенерированы данные: {generated}", file=sys.stderr)
+
+    read_cache.enabled = not args.no_cache
+    # Записи о медленных запросах под нагрузкой только мешают читать результат
+    logging.getLogger("metrics").setLevel(logging.ERROR)
+    engine = create_engine_from_url(database_url)
+    if METRICS_ENABLED:
+        instrument_engine(engine)
+    new_session.configure(bind=engine)
+    dataset = await load_dataset()
+
+    result = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": engine.url.get_backend_name(),
+            "cache": read_cache.enabled,
+            "concurrency": args.concurrency,
+            "users": len(dataset.users),
+            "transactions": dataset.transactions,
+        },
+        "scenarios": {},
+    }
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test") as client:
+        for name in scenarios:
+            if args.warmup:
+                await run_scenario(client, dataset, name, args.warmup, args.concurrency, args.seed + 1)
+            result["scenarios"][name] = await run_scenario(client, dataset, name, args.requests,
+                                                           args.concurrency, args.seed)
+            print(f"{name}: {result['scenarios'][name]}", file=sys.stderr)
+    await engine.dispose()
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = find_regressions(result, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Регрессия: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
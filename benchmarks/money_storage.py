@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, select, insert, func
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import Money
+from money import to_money
+
+# Сравнение хранения денег во float и в целых копейках (database.Money):
+# скорость вставки и агрегации, а также накопленная ошибка суммы.
+# Запуск: python -m benchmarks.money_storage [--rows 200000]
+
+CATEGORIES = 10
+
+metadata = MetaData()
+tables = {
+    "float": Table("float_ledger", metadata,
+                   Column("id", Integer, primary_key=True),
+                   Column("category_id", Integer, nullable=False),
+                   Column("amount", Float, nullable=False)),
+    "cents": Table("cents_ledger", metadata,
+                   Column("id", Integer, primary_key=True),
+                   Column("category_id", Integer, nullable=False),
+                   Column("amount", Money, nullable=False)),
+}
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    amounts = [to_money(random.randint(1, 1_000_000) / 100) for _ in range(args.rows)]
+    rows = [{"category_id": index % CATEGORIES, "amount": amount} for index, amount in enumerate(amounts)]
+    exact = {}
+    for row in rows:
+        exact[row["category_id"]] = exact.get(row["category_id"], Decimal(0)) + row["amount"]
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'money.db')}")
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+
+    for name, table in tables.items():
+        values = [{"category_id": row["category_id"], "amount": float(row["amount"]) if name == "float"
+                   else row["amount"]} for row in rows]
+        async with engine.begin() as conn:
+            started = time.perf_counter()
+            await conn.execute(insert(table), values)
+            insert_seconds = time.perf_counter() - started
+
+        async with engine.connect() as conn:
+            started = time.perf_counter()
+            result = await conn.execute(
+                select(table.c.category_id, func.sum(table.c.amount)).group_by(table.c.category_id)
+            )
+            sums = dict(result.all())
+            aggregate_seconds = time.perf_counter() - started
+
+        max_error = max(abs(Decimal(str(sums[category])) - total) for category, total in exact.items())
+        print({
+            "storage": name,
+            "insert_rows_per_sec": round(args.rows / insert_seconds),
+            "aggregate_ms": round(aggregate_seconds * 1000, 2),
+            "max_sum_error": str(max_error),
+        })
+
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
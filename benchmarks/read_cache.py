@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from cache import read_cache, create_backend
+from database import Base, new_session
+from repository import (UserRepository, AccountRepository, CategoryRepository, BudgetRepository,
+                        TransactionRepository)
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd, SBudgetAdd, STransactionAdd
+
+# Задержка горячих чтений (счета, баланс, категории, бюджеты, пользователь) без кэша и с кэшем.
+# Между чтениями идут редкие записи транзакций, которые сбрасывают кэш счета и его владельца.
+# Запуск: python -m benchmarks.read_cache [--requests 20000] [--write-ratio 0.02] [--backend memory|redis]
+
+USERS = 20
+ACCOUNTS_PER_USER = 3
+
+async def seed():
+    await CategoryRepository.add_category(SCategoryAdd(name="bench"))
+    for user_id in range(1, USERS + 1):
+        await UserRepository.add_user(SUserAdd(name=f"user {user_id}", login=f"login{user_id}",
+                                               email=f"user{user_id}@example.com", password="bench", code="0000"))
+        for index in range(ACCOUNTS_PER_USER):
+            await AccountRepository.add_account(SAccountAdd(name=f"account {index}", balance=0, user_id=user_id))
+        await BudgetRepository.add_budget(SBudgetAdd(name="budget", amount=1000, wasted=0, date=date(2000, 1, 1),
+                                                     target_date=date(2100, 1, 1), user_id=user_id,
+                                                     account_id=(user_id - 1) * ACCOUNTS_PER_USER + 1))
+
+async def hot_read(user_id: int):
+    account_id = (user_id - 1) * ACCOUNTS_PER_USER + random.randint(1, ACCOUNTS_PER_USER)
+    operation = random.randrange(6)
+    if operation == 0:
+        await AccountRepository.get_account_by_id(account_id)
+    elif operation == 1:
+        await AccountRepository.get_accounts_by_user_id(user_id)
+    elif operation == 2:
+        await AccountRepository.get_total_balance(user_id)
+    elif operation == 3:
+        await CategoryRepository.get_categories(100)
+    elif operation == 4:
+        await BudgetRepository.get_budgets_by_user_id(user_id)
+    else:
+        await UserRepository.get_user_by_login(f"login{user_id}")
+
+async def run(args) -> list[float]:
+    random.seed(42)
+    latencies = []
+    for _ in range(args.requests):
+        user_id = random.randint(1, USERS)
+        if random.random() < args.write_ratio:
+            await TransactionRepository.add_transaction(STransactionAdd(
+                name="bench", description="", amount=10, date=date.today(), income=False,
+                account_id=(user_id - 1) * ACCOUNTS_PER_USER + 1, category_id=1
+            ))
+            continue
+        started = time.perf_counter()
+        await hot_read(user_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1]
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--write-ratio", type=float, default=0.02)
+    parser.add_argument("--backend", choices=("memory", "redis"), default="memory")
+    args = parser.parse_args()
+    read_cache.backend = create_backend(args.backend)
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    new_session.configure(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await seed()
+
+    for enabled in (False, True):
+        await read_cache.clear()
+        read_cache.enabled = enabled
+        latencies = await run(args)
+        print({
+            "cache": enabled,
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            **({"stats": read_cache.stats()} if enabled else {}),
+        })
+    await read_cache.close()
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from cache import read_cache
+from config import SQLITE_PRAGMAS
+from database import Base, new_session, apply_sqlite_pragmas
+from mailer import email_queue
+from main import app
+from repository import UserRepository, AccountRepository, CategoryRepository, get_session
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd
+
+# Подключения к БД и задержка на запрос: сессия на запрос (get_session) против прежней схемы,
+# где каждый метод репозитория открывает свою сессию (зависимость подменяется на None).
+# Запуск: python -m benchmarks.request_session [--iterations 300]
+
+def flows(iteration: int) -> dict:
+    user = {"name": "user", "login": f"login{iteration}", "email": f"user{iteration}@example.com",
+            "password": "password", "code": "0000"}
+    transaction = {"name": "tx", "description": "", "amount": 10, "date": date.today().isoformat(),
+                   "income": False, "account_id": 1, "category_id": 1}
+    return {
+        "POST /users/add": ("POST", "/users/add", user),
+        "POST /users/password/recovery": ("POST", "/users/password/recovery", {**user, "email": "bench@example.com"}),
+        "POST /users/password/reset": ("POST", "/users/password/reset",
+                                       {**user, "email": "bench@example.com", "code": "wrong"}),
+        "POST /transactions/add": ("POST", "/transactions/add", transaction),
+        "GET /accounts/user/1": ("GET", "/accounts/user/1", None),
+    }
+
+async def measure(client: httpx.AsyncClient, checkouts: list, iterations: int, prefix: str) -> dict:
+    results = {}
+    for name in flows(0):
+        latencies = []
+        before = checkouts[0]
+        for iteration in range(iterations):
+            method, url, body = flows(f"{prefix}{iteration}")[name]
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert response.status_code < 500, (url, response.status_code, response.text)
+        results[name] = {
+            "checkouts": round((checkouts[0] - before) / iterations, 2),
+            "p50_ms": round(statistics.median(latencies), 2),
+        }
+    return results
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+
+    read_cache.enabled = False
+    # Письма никуда не отправляются: очередь без обработчика и без ограничения размера
+    email_queue.queue = asyncio.Queue()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    apply_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    new_session.configure(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await UserRepository.add_user(SUserAdd(name="bench", login="bench", email="bench@example.com",
+                                           password="bench", code="0000"))
+    await AccountRepository.add_account(SAccountAdd(name="bench", balance=0, user_id=1))
+    await CategoryRepository.add_category(SCategoryAdd(name="bench"))
+
+    checkouts = [0]
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts[0] += 1
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        app.dependency_overrides[get_session] = lambda: None
+        per_call = await measure(client, checkouts, args.iterations, "call")
+        app.dependency_overrides.clear()
+        per_request = await measure(client, checkouts, args.iterations, "request")
+
+    for name in per_call:
+        print(f"{name:<32} сессия на вызов: {per_call[name]}   сессия на запрос: {per_request[name]}")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import Base, new_session, TransactionOrm
+from repository import (UserRepository, AccountRepository, CategoryRepository, TransactionRepository,
+                        select_columns, construct_all)
+from router import FastJSONResponse
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd, STransactionAdd, STransaction
+
+# Микробенчмарк списка транзакций: строк в секунду для прежнего пути (ORM-объекты, model_validate
+# на строку, повторная валидация и сериализация через response_model FastAPI, JSONResponse)
+# и быстрого (колонки, model_construct, orjson). Этапы меряются отдельно: выборка со сборкой схем
+# и рендер ответа.
+# Запуск: python -m benchmarks.serialization [--rows 20000] [--repeat 5]
+
+response_field = create_response_field(name="response", type_=list[STransaction])
+
+async def load_validated(session) -> list[STransaction]:
+    result = await session.execute(select(TransactionOrm))
+    return [STransaction.model_validate(transaction) for transaction in result.scalars().all()]
+
+async def load_constructed(session) -> list[STransaction]:
+    result = await session.execute(select_columns(TransactionOrm))
+    return construct_all(result.all(), STransaction)
+
+async def render_validated(items) -> bytes:
+    content = await serialize_response(field=response_field, response_content=items)
+    return JSONResponse(content).body
+
+async def render_fast(items) -> bytes:
+    return FastJSONResponse(items).body
+
+async def rows_per_second(step, argument, rows: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await step(argument)
+        best = min(best, time.perf_counter() - started)
+    return round(rows / best)
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    new_session.configure(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await UserRepository.add_user(SUserAdd(name="bench", login="bench", email="bench@example.com",
+                                           password="bench", code="0000"))
+    await AccountRepository.add_account(SAccountAdd(name="bench", balance=0, user_id=1))
+    await CategoryRepository.add_category(SCategoryAdd(name="bench"))
+    await TransactionRepository.add_transactions_bulk([
+        STransactionAdd(name="bench", description="benchmark row", amount=round(random.uniform(1, 1000), 2),
+                        date=date.today() - timedelta(days=random.randint(0, 365)), income=random.random() < 0.3,
+                        account_id=1, category_id=1)
+        for _ in range(args.rows)
+    ])
+
+    async with new_session() as session:
+        validated = await load_validated(session)
+        constructed = await load_constructed(session)
+        assert await render_validated(validated) == await render_fast(constructed)
+
+        results = {
+            "load_validated": await rows_per_second(load_validated, session, args.rows, args.repeat),
+            "load_constructed": await rows_per_second(load_constructed, session, args.rows, args.repeat),
+            "render_response_model": await rows_per_second(render_validated, validated, args.rows, args.repeat),
+            "render_orjson": await rows_per_second(render_fast, constructed, args.rows, args.repeat),
+        }
+    await engine.dispose()
+
+    for name, value in results.items():
+        print(f"{name:<24}{value:>12} строк/с")
+    print(f"{'load':<24}{results['load_constructed'] / results['load_validated']:>11.1f}x")
+    print(f"{'render':<24}{results['render_orjson'] / results['render_response_model']:>11.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
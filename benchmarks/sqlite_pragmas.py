@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.exc import OperationalError
+
+from cache import read_cache
+from config import SQLITE_PRAGMAS
+from database import Base, new_session, apply_sqlite_pragmas
+from repository import UserRepository, AccountRepository, CategoryRepository, TransactionRepository
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd, STransactionAdd
+
+# Сравнение пропускной способности конкурентных чтений и записей SQLite
+# с PRAGMA по умолчанию и с профилем из config.SQLITE_PRAGMAS.
+# Запуск: python -m benchmarks.sqlite_pragmas [--duration 5 --readers 8 --writers 4]
+
+ACCOUNTS = 10
+
+async def seed():
+    await UserRepository.add_user(SUserAdd(name="bench", login="bench", email="bench@example.com",
+                                           password="bench", code="0000"))
+    for index in range(ACCOUNTS):
+        await AccountRepository.add_account(SAccountAdd(name=f"account {index}", balance=0, user_id=1))
+    await CategoryRepository.add_category(SCategoryAdd(name="bench"))
+
+async def writer(deadline: float, stats: dict):
+    while time.perf_counter() < deadline:
+        data = STransactionAdd(name="bench", description="", amount=round(random.uniform(1, 100), 2),
+                               date=date.today() - timedelta(days=random.randint(0, 365)),
+                               income=random.random() < 0.3, account_id=random.randint(1, ACCOUNTS),
+                               category_id=1)
+        try:
+            await TransactionRepository.add_transaction(data)
+            stats["writes"] += 1
+        except OperationalError:
+            stats["errors"] += 1
+
+async def reader(deadline: float, stats: dict):
+    while time.perf_counter() < deadline:
+        try:
+            await TransactionRepository.get_transactions_sum_by_category(1, "Year", income=False)
+            await AccountRepository.get_accounts_by_user_id(1)
+            stats["reads"] += 1
+        except OperationalError:
+            stats["errors"] += 1
+
+async def run_profile(name: str, pragmas: dict, args) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    if pragmas:
+        apply_sqlite_pragmas(engine, pragmas)
+    new_session.configure(bind=engine)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await seed()
+
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(
+        *(reader(deadline, stats) for _ in range(args.readers)),
+        *(writer(deadline, stats) for _ in range(args.writers)),
+    )
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    return {
+        "profile": name,
+        "reads_per_sec": round(stats["reads"] / elapsed, 1),
+        "writes_per_sec": round(stats["writes"] / elapsed, 1),
+        "errors": stats["errors"],
+    }
+
+async def main():
+    # Сравниваются настройки SQLite, поэтому чтения идут мимо кэша
+    read_cache.enabled = False
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    for name, pragmas in (("default", {}), ("tuned", SQLITE_PRAGMAS)):
+        result = await run_profile(name, pragmas, args)
+        print(result)
+
+if __name__ == "__main__":
+    asyncio.run(main())
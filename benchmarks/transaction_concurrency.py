@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import select, func, case
+from sqlalchemy.exc import OperationalError
+
+from database import Base, new_session, create_engine_from_url, AccountOrm, BudgetOrm, TransactionOrm
+from repository import (UserRepository, AccountRepository, CategoryRepository, BudgetRepository,
+                        TransactionRepository)
+from rollups import check_rollups
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd, SBudgetAdd, STransactionAdd
+
+# Нагрузочная проверка записи транзакций: параллельные добавления, изменения и удаления,
+# после которых баланс каждого счета, wasted каждого бюджета и transaction_rollups сверяются с транзакциями.
+# Запуск: python -m benchmarks.transaction_concurrency [--workers 16 --operations 200]
+
+ACCOUNTS = 3
+CATEGORIES = 2
+INITIAL_BALANCE = Decimal("1000.00")
+START_DATE = date(2024, 1, 1)
+
+async def seed():
+    await UserRepository.add_user(SUserAdd(name="stress", login="stress", email="stress@example.com",
+                                           password="stress", code="0000"))
+    for index in range(CATEGORIES):
+        await CategoryRepository.add_category(SCategoryAdd(name=f"stress {index}"))
+    for index in range(ACCOUNTS):
+        await AccountRepository.add_account(SAccountAdd(name=f"account {index}", balance=INITIAL_BALANCE, user_id=1))
+        account_id = index + 1
+        # Пересекающиеся бюджеты: январь и первый квартал
+        await BudgetRepository.add_budget(SBudgetAdd(name="month", amount=1000, wasted=0, date=START_DATE,
+                                                     target_date=date(2024, 1, 31), user_id=1,
+                                                     account_id=account_id))
+        await BudgetRepository.add_budget(SBudgetAdd(name="quarter", amount=3000, wasted=0, date=START_DATE,
+                                                     target_date=date(2024, 3, 31), user_id=1,
+                                                     account_id=account_id))
+
+# Случайная операция над транзакциями: ("add", data), ("update", id, data) или ("delete", id).
+# created - существующие транзакции по id; изменение может перенести транзакцию на другой счет,
+# в другое окно бюджетов, сменить тип и категорию. Генератор задается rng, чтобы прогон можно было повторить
+def random_operation(rng: random.Random, created: dict) -> tuple:
+    action = rng.random()
+    if action < 0.6 or not created:
+        return ("add", STransactionAdd(name="stress", description="", amount=rng.randint(1, 10000) / 100,
+                                       date=START_DATE + timedelta(days=rng.randint(0, 120)),
+                                       income=rng.random() < 0.4, account_id=rng.randint(1, ACCOUNTS),
+                                       category_id=rng.randint(1, CATEGORIES)))
+    transaction_id = rng.choice(list(created))
+    if action < 0.85:
+        data = created[transaction_id]
+        changes = {"amount": rng.randint(1, 10000) / 100}
+        if rng.random() < 0.5:
+            changes["account_id"] = rng.randint(1, ACCOUNTS)
+        if rng.random() < 0.5:
+            changes["date"] = START_DATE + timedelta(days=rng.randint(0, 120))
+        if rng.random() < 0.3:
+            changes["income"] = not data.income
+        if rng.random() < 0.3:
+            changes["category_id"] = rng.randint(1, CATEGORIES)
+        return ("update", transaction_id, STransactionAdd(**{**data.model_dump(), **changes}))
+    return ("delete", transaction_id)
+
+async def apply_operation(operation: tuple, created: dict):
+    if operation[0] == "add":
+        transaction = await TransactionRepository.add_transaction(operation[1])
+        created[transaction.id] = operation[1]
+    elif operation[0] == "update":
+        _, transaction_id, data = operation
+        await TransactionRepository.update_transaction(transaction_id, data)
+        # Параллельный воркер мог удалить транзакцию, пока шло изменение
+        if transaction_id in created:
+            created[transaction_id] = data
+    else:
+        _, transaction_id = operation
+        del created[transaction_id]
+        await TransactionRepository.delete_transaction_by_id(transaction_id)
+
+async def worker(rng: random.Random, operations: int, created: dict, stats: dict):
+    for _ in range(operations):
+        try:
+            await apply_operation(random_operation(rng, created), created)
+            stats["ok"] += 1
+        except HTTPException as e:
+            stats[f"http_{e.status_code}"] = stats.get(f"http_{e.status_code}", 0) + 1
+        except OperationalError:
+            stats["locked"] += 1
+
+async def check() -> list[str]:
+    problems = []
+    async with new_session() as session:
+        signed = case((TransactionOrm.income, TransactionOrm.amount), else_=-TransactionOrm.amount)
+        sums = dict((await session.execute(
+            select(TransactionOrm.account_id, func.sum(signed)).group_by(TransactionOrm.account_id)
+        )).all())
+        for account in (await session.execute(select(AccountOrm))).scalars():
+            expected = INITIAL_BALANCE + (sums.get(account.id) or 0)
+            if account.balance != expected:
+                problems.append(f"account {account.id}: balance {account.balance} != {expected}")
+
+        for budget in (await session.execute(select(BudgetOrm))).scalars():
+            expected = (await session.execute(
+                select(func.coalesce(func.sum(TransactionOrm.amount), 0)).where(
+                    TransactionOrm.account_id == budget.account_id,
+                    TransactionOrm.income == False,
+                    TransactionOrm.date >= budget.date,
+                    TransactionOrm.date <= budget.target_date,
+                )
+            )).scalar()
+            if budget.wasted != expected:
+                problems.append(f"budget {budget.id}: wasted {budget.wasted} != {expected}")
+    problems.extend(await check_rollups())
+    return problems
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--database-url", default=None,
+                        help="по умолчанию временная база SQLite")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+    engine = create_engine_from_url(url)
+    new_session.configure(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await seed()
+
+    created = {}
+    stats = {"ok": 0, "locked": 0}
+    await asyncio.gather(*(worker(rng, args.operations, created, stats) for _ in range(args.workers)))
+    problems = await check()
+    await engine.dispose()
+
+    print(stats)
+    for problem in problems:
+        print("MISMATCH", problem)
+    print("OK" if not problems else f"{len(problems)} mismatches")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
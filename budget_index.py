@@ -0,0 +1,62 @@
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from config import BUDGET_INDEX_MAXSIZE
+from database import BudgetOrm
+
+# Окна бюджетов одного счета для поиска всех бюджетов, покрывающих дату.
+# Границы окон делят ось дат на отрезки, внутри которых набор покрывающих бюджетов не меняется;
+# поиск - бинарный по границам, O(log n) плюс размер ответа. Перекрывающиеся бюджеты учитываются все.
+class BudgetWindows:
+    def __init__(self, revision: int, budgets: list[tuple[int, date, date]]):
+        self.revision = revision
+        boundaries = set()
+        for _, start, end in budgets:
+            boundaries.add(start)
+            if end < date.max:
+                boundaries.add(end + timedelta(days=1))
+        self.boundaries = sorted(boundaries)
+        # Построение O(n * m) по числу бюджетов и границ: у счета их десятки
+        self.segments = [
+            tuple(budget_id for budget_id, start, end in budgets if start <= boundary <= end)
+            for boundary in self.boundaries
+        ]
+
+    def covering(self, day: date) -> tuple[int, ...]:
+        index = bisect_right(self.boundaries, day) - 1
+        return self.segments[index] if index >= 0 else ()
+
+# Индекс окон бюджетов по счетам в памяти процесса (LRU). Актуальность проверяется по accounts.budgets_revision:
+# BudgetRepository меняет ревизию счета в той же транзакции, что и бюджеты, а запись транзакции получает
+# ревизию тем же UPDATE баланса. При несовпадении окна счета перечитываются в сессии вызывающего,
+# поэтому видны и незафиксированные изменения бюджетов этой же транзакции, и изменения других воркеров.
+class BudgetIndex:
+    def __init__(self, maxsize: int = BUDGET_INDEX_MAXSIZE):
+        self.maxsize = maxsize
+        self._windows = OrderedDict()
+        self.loads = 0
+
+    async def windows(self, session, account_id: int, revision: int) -> BudgetWindows:
+        windows = self._windows.get(account_id)
+        if windows is None or windows.revision != revision:
+            result = await session.execute(
+                select(BudgetOrm.id, BudgetOrm.date, BudgetOrm.target_date).where(BudgetOrm.account_id == account_id)
+            )
+            windows = BudgetWindows(revision, [tuple(row) for row in result.all()])
+            self._windows[account_id] = windows
+            self.loads += 1
+            while len(self._windows) > self.maxsize:
+                self._windows.popitem(last=False)
+        self._windows.move_to_end(account_id)
+        return windows
+
+    async def covering(self, session, account_id: int, revision: int, day: date) -> tuple[int, ...]:
+        return (await self.windows(session, account_id, revision)).covering(day)
+
+    def clear(self):
+        self._windows.clear()
+
+budget_index = BudgetIndex()
@@ -0,0 +1,282 @@
+import functools
+import inspect
+import logging
+import time
+import typing
+from collections import OrderedDict
+from typing import Any, Optional
+
+from pydantic import TypeAdapter, ValidationError
+
+from config import CACHE_ENABLED, CACHE_BACKEND, CACHE_MAXSIZE, CACHE_TTL, CACHE_KEY_PREFIX, REDIS_URL, ETAGS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Схема значения для хранилищ, которые держат записи вне процесса: значение сохраняется как JSON
+# и при чтении проверяется по схеме, поэтому запись в хранилище не может выполнить код в приложении
+ANY_VALUE = TypeAdapter(Any)
+
+# Хранилище кэша чтения. Инвалидация через версии тегов: ключ записи содержит текущие версии
+# ее тегов, запись репозитория увеличивает версию тега, и старые записи больше не находятся
+# (их вытесняет LRU или TTL). Версии лежат в том же хранилище, поэтому при общем хранилище
+# (Redis) сброс виден всем воркерам сразу.
+class CacheBackend:
+    async def get(self, key: str, schema: TypeAdapter = ANY_VALUE) -> tuple[bool, Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float, schema: TypeAdapter = ANY_VALUE):
+        raise NotImplementedError
+
+    async def get_versions(self, tags: tuple[str, ...]) -> list[int]:
+        raise NotImplementedError
+
+    async def bump_versions(self, tags: tuple[str, ...]):
+        raise NotImplementedError
+
+    # Версия тега, время ее изменения (unix time) и эпоха хранилища: при потере версий (перезапуск
+    # процесса с кэшем в памяти) эпоха меняется, и выданные ранее ETag не совпадут с новыми
+    async def get_version_info(self, tag: str) -> tuple[int, float, str]:
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+# Кэш в памяти процесса: LRU с ограничением размера и временем жизни записи
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, maxsize: int = CACHE_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._modified = {}
+        self.started_at = time.time()
+        self.evictions = 0
+
+    async def get(self, key: str, schema: TypeAdapter = ANY_VALUE) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    async def set(self, key: str, value: Any, ttl: float, schema: TypeAdapter = ANY_VALUE):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_versions(self, tags: tuple[str, ...]) -> list[int]:
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    async def bump_versions(self, tags: tuple[str, ...]):
+        now = time.time()
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+            self._modified[tag] = now
+
+    async def get_version_info(self, tag: str) -> tuple[int, float, str]:
+        return self._versions.get(tag, 0), self._modified.get(tag, self.started_at), f"{self.started_at:.6f}"
+
+    async def clear(self):
+        self._entries.clear()
+        self._versions.clear()
+        self._modified.clear()
+        self.started_at = time.time()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "evictions": self.evictions}
+
+# Общий кэш для нескольких воркеров и контейнеров по протоколу Redis.
+# Размер ограничивается настройкой maxmemory-policy allkeys-lru сервера; значения хранятся в JSON по схеме.
+# Ошибки Redis и записи, не прошедшие проверку схемы, не ломают чтение: запрос уходит в БД, как при промахе.
+class RedisCacheBackend(CacheBackend):
+    def __init__(self, url: str = REDIS_URL, prefix: str = CACHE_KEY_PREFIX, client=None):
+        self.url = url
+        self.prefix = prefix
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Зависимость нужна только при CACHE_BACKEND=redis
+            import redis.asyncio
+            self._client = redis.asyncio.from_url(self.url)
+        return self._client
+
+    async def get(self, key: str, schema: TypeAdapter = ANY_VALUE) -> tuple[bool, Any]:
+        try:
+            data = await self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning("Ошибка чтения из кэша: %s", e)
+            return False, None
+        if data is None:
+            return False, None
+        try:
+            return True, schema.validate_json(data)
+        except ValidationError as e:
+            logger.warning("Запись кэша %s не соответствует схеме: %s", key, e)
+            return False, None
+
+    async def set(self, key: str, value: Any, ttl: float, schema: TypeAdapter = ANY_VALUE):
+        try:
+            await self.client.set(self.prefix + key, schema.dump_json(value), px=int(ttl * 1000))
+        except Exception as e:
+            logger.warning("Ошибка записи в кэш: %s", e)
+
+    async def get_versions(self, tags: tuple[str, ...]) -> list[int]:
+        if not tags:
+            return []
+        values = await self.client.mget([self.prefix + "v:" + tag for tag in tags])
+        return [int(value) if value is not None else 0 for value in values]
+
+    async def bump_versions(self, tags: tuple[str, ...]):
+        now = time.time()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(self.prefix + "v:" + tag)
+                pipe.set(self.prefix + "t:" + tag, now)
+            await pipe.execute()
+
+    async def get_version_info(self, tag: str) -> tuple[int, float, str]:
+        # Эпоха общая для всех воркеров: первый записавший ее процесс задает время начала отсчета
+        await self.client.set(self.prefix + "epoch", time.time(), nx=True)
+        epoch, version, modified = await self.client.mget(
+            [self.prefix + "epoch", self.prefix + "v:" + tag, self.prefix + "t:" + tag]
+        )
+        epoch = epoch.decode()
+        return int(version or 0), float(modified or epoch), epoch
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+def create_backend(name: str = CACHE_BACKEND) -> CacheBackend:
+    if name == "redis":
+        return RedisCacheBackend()
+    if name == "memory":
+        return MemoryCacheBackend()
+    raise ValueError(f"Неизвестный CACHE_BACKEND: {name}")
+
+# Кэш результатов чтения репозитория поверх выбранного хранилища со счетчиками этого процесса
+class ReadCache:
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: float = CACHE_TTL, enabled: bool = CACHE_ENABLED,
+                 etags: bool = ETAGS_ENABLED):
+        self.backend = backend if backend is not None else create_backend()
+        self.ttl = ttl
+        self.enabled = enabled
+        self.etags = etags
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, key: str, tags: tuple[str, ...], schema: TypeAdapter = ANY_VALUE) -> tuple[bool, Any, str]:
+        try:
+            versions = await self.backend.get_versions(tags)
+        except Exception as e:
+            # Без версий нельзя доверять записи: читаем из БД и не кэшируем
+            logger.warning("Ошибка чтения версий кэша: %s", e)
+            self.misses += 1
+            return False, None, ""
+        versioned_key = key + "@" + ",".join(map(str, versions))
+        found, value = await self.backend.get(versioned_key, schema)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found, value, versioned_key
+
+    async def set(self, versioned_key: str, value: Any, schema: TypeAdapter = ANY_VALUE):
+        if versioned_key:
+            await self.backend.set(versioned_key, value, self.ttl, schema)
+
+    # Версии увеличиваются и при выключенном кэше: на них построены ETag ответов
+    async def invalidate(self, *tags: str):
+        if not tags:
+            return
+        try:
+            await self.backend.bump_versions(tuple(dict.fromkeys(tags)))
+            self.invalidations += len(tags)
+        except Exception as e:
+            logger.error("Не удалось сбросить кэш по тегам %s: %s", tags, e)
+
+    # Слабый ETag и время изменения ресурса, которому соответствует тег; None, если ETag выключены
+    # (см. ETAGS_ENABLED) или хранилище недоступно
+    async def resource_version(self, tag: str) -> Optional[tuple[str, float]]:
+        if not self.etags:
+            return None
+        try:
+            version, modified, epoch = await self.backend.get_version_info(tag)
+        except Exception as e:
+            logger.warning("Ошибка чтения версии ресурса: %s", e)
+            return None
+        return f'W/"{epoch}-{version}"', modified
+
+    async def clear(self):
+        await self.backend.clear()
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "etags": self.etags,
+            **self.backend.stats(),
+        }
+
+read_cache = ReadCache()
+
+# Кэширование асинхронного метода репозитория. Теги - шаблоны по именам аргументов,
+# например @cached("user:{user_id}:accounts"). Исключения (404 и т.п.) не кэшируются.
+# Сессия запроса в ключ не входит; если в ней уже есть незафиксированные записи, кэш не используется.
+# Схема значения в хранилище берется из аннотации возвращаемого типа, поэтому она обязательна.
+def cached(*tag_templates: str):
+    def decorator(func):
+        signature = inspect.signature(func)
+        return_type = typing.get_type_hints(func).get("return")
+        if return_type is None:
+            raise TypeError(f"У кэшируемого метода {func.__qualname__} не указан возвращаемый тип")
+        schema = TypeAdapter(return_type)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not read_cache.enabled:
+                return await func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(list(bound.arguments.items())[1:])
+            session = arguments.pop("session", None)
+            if session is not None and session.info.get("cache_tags"):
+                return await func(*args, **kwargs)
+            key = func.__qualname__ + repr(tuple(arguments.items()))
+            tags = tuple(template.format(**arguments) for template in tag_templates)
+
+            found, value, versioned_key = await read_cache.get(key, tags, schema)
+            if found:
+                return value
+            value = await func(*args, **kwargs)
+            await read_cache.set(versioned_key, value, schema)
+            return value
+
+        return wrapper
+    return decorator
@@ -1,11 +1,42 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 from sqlalchemy.orm import Mapped, DeclarativeBase, mapped_column, relationship
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, BigInteger, event, make_url
+from sqlalchemy.types import TypeDecorator
 from typing import List, Optional
+from decimal import Decimal
+import datetime
+
+from money import to_cents, from_cents
+
+from config import (DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+                    SQLITE_TUNING, SQLITE_PRAGMAS)
+
+# Выполнение PRAGMA при каждом новом соединении с SQLite
+def apply_sqlite_pragmas(engine: AsyncEngine, pragmas: dict):
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def create_engine_from_url(url: str) -> AsyncEngine:
+    if make_url(url).get_backend_name() == "sqlite":
+        sqlite_engine = create_async_engine(url)
+        if SQLITE_TUNING:
+            apply_sqlite_pragmas(sqlite_engine, SQLITE_PRAGMAS)
+        return sqlite_engine
+
+    return create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
 
-engine = create_async_engine(
-    "sqlite+aiosqlite:///finance.db"
-)
+engine = create_engine_from_url(DATABASE_URL)
 
 # mapper_registry = registry()
 new_session = async_sessionmaker(engine, expire_on_commit=False)
@@ -17,8 +48,28 @@ new_session = async_sessionmaker(engine, expire_on_commit=False)
 class Base(DeclarativeBase):
     pass
 
+# Денежная колонка: целое число копеек в БД, Decimal в приложении. Суммирование и
+# инкременты баланса выполняются над целыми числами и не накапливают ошибку округления.
+class Money(TypeDecorator):
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return from_cents(value)
+
 class UserOrm(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_email", "email", unique=True),
+        Index("ix_users_login", "login", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
@@ -39,11 +90,17 @@ class UserOrm(Base):
 
 class AccountOrm(Base):
     __tablename__ = "accounts"
+    __table_args__ = (
+        Index("ix_accounts_user_id", "user_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
-    balance: Mapped[float]
+    balance: Mapped[Decimal] = mapped_column(Money)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
+    # Ревизия набора бюджетов счета для индекса окон бюджетов (budget_index); в ответы API не попадает
+    budgets_revision: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0",
+                                                  info={"internal": True})
 
     user = relationship("UserOrm", back_populates="accounts")
 
@@ -56,12 +113,16 @@ class AccountOrm(Base):
 
 class TransactionOrm(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Покрывает выборки по счету, по счету и типу, и сводки за период
+        Index("ix_transactions_account_id_income_date", "account_id", "income", "date"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
     description: Mapped[str]
-    amount: Mapped[float]
-    date: Mapped[str]
+    amount: Mapped[Decimal] = mapped_column(Money)
+    date: Mapped[datetime.date]
     income: Mapped[bool]
     account_id: Mapped[int] = mapped_column(ForeignKey('accounts.id'))
     category_id: Mapped[int] = mapped_column(ForeignKey('categories.id'))
@@ -81,12 +142,15 @@ class CategoryOrm(Base):
 
 class FinancialGoalOrm(Base):
     __tablename__ = "financial_goals"
+    __table_args__ = (
+        Index("ix_financial_goals_user_id_is_done", "user_id", "is_done"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
     desc: Mapped[Optional[str]] = mapped_column(nullable=True)
-    amount: Mapped[float]
-    target_amount: Mapped[float]
+    amount: Mapped[Decimal] = mapped_column(Money)
+    target_amount: Mapped[Decimal] = mapped_column(Money)
     target_date: Mapped[Optional[str]] = mapped_column(nullable=True)
     is_done: Mapped[bool]
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
@@ -95,19 +159,36 @@ class FinancialGoalOrm(Base):
 
 class BudgetOrm(Base):
     __tablename__ = "budgets"
+    __table_args__ = (
+        # Поиск бюджета по счету и дате транзакции при каждой записи транзакции
+        Index("ix_budgets_account_id_date_target_date", "account_id", "date", "target_date"),
+        Index("ix_budgets_user_id", "user_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
-    amount: Mapped[float]
-    wasted: Mapped[float]
-    date: Mapped[str]
-    target_date: Mapped[str]
+    amount: Mapped[Decimal] = mapped_column(Money)
+    wasted: Mapped[Decimal] = mapped_column(Money)
+    date: Mapped[datetime.date]
+    target_date: Mapped[datetime.date]
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
     account_id: Mapped[int] = mapped_column(ForeignKey('accounts.id'))
 
     user = relationship("UserOrm", back_populates="budgets")
     account = relationship("AccountOrm", back_populates="budgets")
 
+# Предагрегированные суммы транзакций по пользователю, типу, дню и категории.
+# Поддерживаются TransactionRepository в той же транзакции БД, что и сами записи.
+class TransactionRollupOrm(Base):
+    __tablename__ = "transaction_rollups"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), primary_key=True)
+    income: Mapped[bool] = mapped_column(primary_key=True)
+    day: Mapped[datetime.date] = mapped_column(primary_key=True)
+    category_id: Mapped[int] = mapped_column(ForeignKey('categories.id'), primary_key=True)
+    total: Mapped[Decimal] = mapped_column(Money)
+    count: Mapped[int]
+
 # user_table = Table(
 #     "users",
 #     mapper_registry.metadata,
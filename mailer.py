@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from typing import Optional
+
+from config import (SMTP_HOST, SMTP_PORT, SMTP_STARTTLS, SMTP_USER, SMTP_PASSWORD, SMTP_SENDER, SMTP_TIMEOUT,
+                    EMAIL_QUEUE_SIZE, EMAIL_MAX_RETRIES, EMAIL_RETRY_BACKOFF)
+
+logger = logging.getLogger(__name__)
+
+# Отправка писем недоступна: очередь не запущена или не настроена авторизация SMTP
+class MailerUnavailable(RuntimeError):
+    pass
+
+# Фоновая отправка писем: обработчик запроса только кладет письмо в очередь,
+# а отдельный воркер отправляет его через одно переиспользуемое SMTP-соединение.
+# Блокирующий smtplib работает в выделенном потоке и не останавливает event loop.
+class EmailQueue:
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, user: str = SMTP_USER,
+                 password: str = SMTP_PASSWORD, sender: str = SMTP_SENDER, starttls: bool = SMTP_STARTTLS,
+                 timeout: int = SMTP_TIMEOUT, maxsize: int = EMAIL_QUEUE_SIZE,
+                 max_retries: int = EMAIL_MAX_RETRIES, retry_backoff: float = EMAIL_RETRY_BACKOFF):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.sender = sender
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.maxsize = maxsize
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._smtp: Optional[smtplib.SMTP] = None
+
+    # Для авторизации на сервере нужен пароль; без него очередь не запускается
+    @property
+    def enabled(self) -> bool:
+        return not self.user or bool(self.password)
+
+    async def start(self):
+        if not self.enabled:
+            logger.warning("Отправка писем отключена: для SMTP_USER %s не задан SMTP_PASSWORD", self.user)
+            return
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Не отправлено писем при остановке: %s", self.queue.qsize())
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+        self._executor.shutdown(wait=True)
+        self._worker = None
+        self.queue = None
+
+    # Постановка письма в очередь; при переполнении - asyncio.QueueFull
+    def enqueue(self, recipient: str, message: Message):
+        if self.queue is None:
+            raise MailerUnavailable("Очередь писем не запущена")
+        self.queue.put_nowait((recipient, message))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            recipient, message = await self.queue.get()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        await loop.run_in_executor(self._executor, self._send, recipient, message)
+                        break
+                    except (smtplib.SMTPException, OSError) as e:
+                        if attempt == self.max_retries:
+                            logger.error("Письмо для %s не отправлено: %s", recipient, e)
+                            break
+                        delay = self.retry_backoff * 2 ** attempt
+                        logger.warning("Ошибка отправки письма для %s (%s), повтор через %.1f с",
+                                       recipient, e, delay)
+                        await asyncio.sleep(delay)
+            # Ошибка одного письма (например, при сборке сообщения) не должна останавливать воркер
+            except Exception:
+                logger.exception("Письмо для %s не отправлено", recipient)
+            finally:
+                self.queue.task_done()
+
+    # Выполняется в потоке SMTP: соединение открывается один раз и переиспользуется
+    def _send(self, recipient: str, message: Message):
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+            except (smtplib.SMTPException, OSError):
+                self._close()
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                if self.user:
+                    smtp.login(self.user, self.password)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+        try:
+            self._smtp.sendmail(self.sender, recipient, message.as_string())
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._close()
+            raise
+
+    def _close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+email_queue = EmailQueue()
@@ -3,12 +3,21 @@ from contextlib import asynccontextmanager
 import uvicorn
 
 from database import create_tables, delete_tables
+from migrations import migrate
+from mailer import email_queue
+from cache import read_cache
+from config import METRICS_ENABLED
+from database import engine
+from metrics import MetricsMiddleware, instrument_engine
+import profiling
 from router import router as user_router
 from router import accountRouter as account_router
 from router import transactionRouter as transaction_router
 from router import categoryRouter as category_router
 from router import financialGoalRouter as financial_goal_router
 from router import budgetRouter as budget_router
+from router import cacheRouter as cache_router
+from router import metricsRouter as metrics_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -16,7 +25,11 @@ async def lifespan(app: FastAPI):
     # print("База очищена")
     # await create_tables()
     # print("База готова")
+    await migrate()
+    await email_queue.start()
     yield
+    await email_queue.stop()
+    await read_cache.close()
     print("Выключение")
 
 app = FastAPI(lifespan=lifespan)
@@ -26,6 +39,16 @@ app.include_router(transaction_router)
 app.include_router(category_router)
 app.include_router(financial_goal_router)
 app.include_router(budget_router)
+app.include_router(cache_router)
+
+if METRICS_ENABLED:
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+if profiling.profiling_available():
+    profiling.instrument_engine(engine)
+    app.add_middleware(profiling.ProfilingMiddleware)
 
 # if __name__ == "__main__":
 #     uvicorn.run(app, host="192.168.0.115", port=8000)
@@ -0,0 +1,197 @@
+import functools
+import inspect
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from config import SLOW_REQUEST_MS, SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+
+# Метрики приложения в формате Prometheus (text exposition 0.0.4) без внешних зависимостей:
+# задержка и статусы по маршрутам, число и время SQL-запросов по запросам и методам репозитория.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # Для каждого набора меток: счетчики по корзинам, сумма и количество наблюдений
+        self.values = {}
+
+    def observe(self, value: float, labels: tuple = ()):
+        counts, total, count = self.values.get(labels, ([0] * len(self.buckets), 0.0, 0))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        self.values[labels] = (counts, total + value, count + 1)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{format_labels(labels + (('le', bound),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+http_request_duration = Histogram("http_request_duration_seconds", "Время обработки HTTP-запроса")
+http_requests = Counter("http_requests_total", "HTTP-запросы по маршруту и статусу")
+http_request_db_queries = Counter("http_request_db_queries_total", "SQL-запросы, выполненные при обработке маршрута")
+http_request_db_seconds = Counter("http_request_db_seconds_total", "Время SQL-запросов при обработке маршрута")
+db_query_duration = Histogram("db_query_duration_seconds", "Время SQL-запроса по методу репозитория")
+
+METRICS = [http_request_duration, http_requests, http_request_db_queries, http_request_db_seconds, db_query_duration]
+
+def render_metrics(extra: Optional[list[str]] = None) -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra or [])
+    return "\n".join(lines) + "\n"
+
+# Статистика SQL текущего HTTP-запроса; задачи asyncio.gather наследуют тот же объект
+class RequestStats:
+    def __init__(self, route: str):
+        self.route = route
+        self.queries = 0
+        self.db_seconds = 0.0
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+current_repository_method: ContextVar[str] = ContextVar("current_repository_method", default="-")
+
+# ASGI-middleware: задержка, статус и SQL-статистика по шаблону маршрута (/accounts/user/{user_id}),
+# а не по фактическому пути, чтобы число рядов метрик не росло с числом id
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(route="unmatched")
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = scope.get("route")
+            stats.route = route.path if route is not None else "unmatched"
+            labels = (("method", scope["method"]), ("route", stats.route))
+            http_request_duration.observe(elapsed, labels)
+            http_requests.inc(labels + (("status", status),))
+            http_request_db_queries.inc(labels, stats.queries)
+            http_request_db_seconds.inc(labels, stats.db_seconds)
+            if elapsed * 1000 >= SLOW_REQUEST_MS:
+                logger.warning("Медленный запрос %s %s: %.1f мс, SQL-запросов %d, %.1f мс в БД",
+                               scope["method"], scope["path"], elapsed * 1000, stats.queries,
+                               stats.db_seconds * 1000)
+
+# Хуки SQLAlchemy: время каждого запроса к БД с привязкой к HTTP-запросу и методу репозитория
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        method = current_repository_method.get()
+        db_query_duration.observe(elapsed, (("repository_method", method),))
+
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            logger.warning("Медленный SQL-запрос в %s (%.1f мс): %s", method, elapsed * 1000,
+                           " ".join(statement.split())[:500])
+
+# Декоратор класса репозитория: запросы внутри его методов помечаются именем "Класс.метод"
+def instrument_repository(cls):
+    for name, attribute in list(vars(cls).items()):
+        if not isinstance(attribute, classmethod):
+            continue
+        func = attribute.__func__
+        label = f"{cls.__name__}.{name}"
+        if inspect.isasyncgenfunction(func):
+            wrapper = _wrap_async_generator(func, label)
+        elif inspect.iscoroutinefunction(func):
+            wrapper = _wrap_coroutine(func, label)
+        else:
+            continue
+        setattr(cls, name, classmethod(wrapper))
+    return cls
+
+def _wrap_coroutine(func, label: str):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = current_repository_method.set(label)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_repository_method.reset(token)
+    return wrapper
+
+def _wrap_async_generator(func, label: str):
+    # Генератор может продолжаться в другом контексте (StreamingResponse), поэтому метка ставится
+    # только на время получения очередного элемента
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        generator = func(*args, **kwargs)
+        try:
+            while True:
+                token = current_repository_method.set(label)
+                try:
+                    item = await generator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    current_repository_method.reset(token)
+                yield item
+        finally:
+            await generator.aclose()
+    return wrapper
@@ -0,0 +1,180 @@
+import asyncio
+from datetime import date, datetime
+
+from sqlalchemy import text, inspect, MetaData
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from database import engine, Base
+from rollups import rebuild_statements
+
+# Форматы, в которых даты могли сохраняться строками до перехода на тип Date
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%Y/%m/%d", "%d/%m/%Y")
+
+DATE_COLUMNS = (
+    ("transactions", "date"),
+    ("budgets", "date"),
+    ("budgets", "target_date"),
+)
+
+def parse_legacy_date(value) -> date:
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Не удалось распознать дату: {value!r}")
+
+# Приведение строковых дат к ISO (YYYY-MM-DD), чтобы сравнение по колонке работало как по диапазону
+def normalize_dates(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    for table, column in DATE_COLUMNS:
+        rows = conn.execute(text(f'SELECT id, "{column}" FROM {table}')).all()
+        for row_id, value in rows:
+            normalized = parse_legacy_date(value).isoformat()
+            if normalized != value:
+                conn.execute(
+                    text(f'UPDATE {table} SET "{column}" = :value WHERE id = :id'),
+                    {"value": normalized, "id": row_id}
+                )
+
+# Уникальные индексы users появились позже самой таблицы, и в старой базе могут быть повторяющиеся email
+# или login. CREATE UNIQUE INDEX упал бы на них ошибкой целостности без указания строк, поэтому
+# до создания индексов дубликаты ищутся и перечисляются с id пользователей. Автоматически они не
+# исправляются: какую учетную запись оставить, решает администратор
+UNIQUE_USER_COLUMNS = ("email", "login")
+
+def check_duplicate_users(conn):
+    if not inspect(conn).has_table("users"):
+        return
+    existing_indexes = {index["name"] for index in inspect(conn).get_indexes("users")}
+    problems = []
+    for column in UNIQUE_USER_COLUMNS:
+        if f"ix_users_{column}" in existing_indexes:
+            continue
+        rows = conn.execute(text(
+            f'SELECT "{column}", id FROM users WHERE "{column}" IN '
+            f'(SELECT "{column}" FROM users GROUP BY "{column}" HAVING COUNT(*) > 1) ORDER BY "{column}", id'
+        )).all()
+        duplicates = {}
+        for value, user_id in rows:
+            duplicates.setdefault(value, []).append(user_id)
+        problems.extend(f"{column} {value!r}: id {ids}" for value, ids in duplicates.items())
+    if problems:
+        raise RuntimeError("Повторяющиеся пользователи мешают создать уникальные индексы users; "
+                           "объедините или измените записи и повторите миграцию:\n" + "\n".join(problems))
+
+# create_all создает индексы только вместе с новой таблицей, поэтому для существующих таблиц они создаются отдельно
+def create_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+MONEY_COLUMNS = (
+    ("accounts", "balance"),
+    ("transactions", "amount"),
+    ("budgets", "amount"),
+    ("budgets", "wasted"),
+    ("financial_goals", "amount"),
+    ("financial_goals", "target_amount"),
+)
+
+# Перевод денежных колонок из float в целые копейки
+def convert_money_to_cents(conn):
+    for table, column in MONEY_COLUMNS:
+        if conn.dialect.name == "sqlite":
+            conn.execute(text(f'UPDATE {table} SET "{column}" = CAST(ROUND("{column}" * 100) AS INTEGER)'))
+        else:
+            conn.execute(text(
+                f'ALTER TABLE {table} ALTER COLUMN "{column}" TYPE BIGINT USING ROUND("{column}" * 100)'
+            ))
+
+# Заполнение transaction_rollups по уже существующим транзакциям
+def build_transaction_rollups(conn):
+    for statement in rebuild_statements():
+        conn.execute(statement)
+
+# Ревизия бюджетов счета для индекса окон бюджетов
+def add_accounts_budgets_revision(conn):
+    conn.execute(text("ALTER TABLE accounts ADD COLUMN budgets_revision BIGINT NOT NULL DEFAULT 0"))
+
+# Пересоздание таблицы SQLite по описанию в Base.metadata с копированием строк: ALTER TABLE в SQLite
+# не меняет тип колонки. Новая таблица создается под временным именем и переименовывается после
+# удаления старой, поэтому внешние ключи других таблиц продолжают ссылаться на прежнее имя.
+# Как и в процедуре из документации SQLite, проверка внешних ключей в соединении должна быть выключена
+# (приложение ее не включает): удаление старой таблицы иначе нарушило бы ссылки на нее
+def rebuild_sqlite_table(conn, name: str):
+    if conn.execute(text("PRAGMA foreign_keys")).scalar():
+        raise RuntimeError(f"Пересоздание таблицы {name} требует PRAGMA foreign_keys = OFF")
+    table = Base.metadata.tables[name]
+    metadata = MetaData()
+    for other in Base.metadata.sorted_tables:
+        other.to_metadata(metadata)
+    temporary = table.to_metadata(metadata, name=f"{name}_rebuild")
+    existing = {column["name"] for column in inspect(conn).get_columns(name)}
+    columns = ", ".join(f'"{column.name}"' for column in table.columns if column.name in existing)
+
+    conn.execute(CreateTable(temporary))
+    conn.execute(text(f"INSERT INTO {temporary.name} ({columns}) SELECT {columns} FROM {name}"))
+    conn.execute(text(f"DROP TABLE {name}"))
+    conn.execute(text(f"ALTER TABLE {temporary.name} RENAME TO {name}"))
+    for index in table.indexes:
+        index.create(conn)
+    problems = conn.execute(text(f"PRAGMA foreign_key_check({name})")).all()
+    if problems:
+        raise RuntimeError(f"Нарушены внешние ключи таблицы {name}: {problems}")
+
+# Денежные колонки SQLite после 0001 сохраняли объявленный тип FLOAT: копейки хранились как REAL и теряли
+# точность выше 2^53. Таблицы пересоздаются с колонками BIGINT (INTEGER affinity); в PostgreSQL тип
+# уже изменен шагом 0001
+def convert_money_columns_to_integer(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    for name in dict.fromkeys(table for table, _ in MONEY_COLUMNS):
+        types = {column["name"]: str(column["type"]) for column in inspect(conn).get_columns(name)}
+        if any(types[column] not in ("BIGINT", "INTEGER") for table, column in MONEY_COLUMNS if table == name):
+            rebuild_sqlite_table(conn, name)
+
+# Одноразовые шаги, которые нельзя повторять; применённые записываются в schema_migrations.
+# Приведение дат идет первым: агрегаты 0002 группируют транзакции по дню
+MIGRATIONS = (
+    ("0000_normalize_dates", normalize_dates),
+    ("0001_money_to_cents", convert_money_to_cents),
+    ("0002_build_transaction_rollups", build_transaction_rollups),
+    ("0003_accounts_budgets_revision", add_accounts_budgets_revision),
+    ("0004_money_columns_integer", convert_money_columns_to_integer),
+)
+
+def apply_migrations(conn, fresh_database: bool):
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_migrations (name VARCHAR(100) PRIMARY KEY)"))
+    applied = set(conn.execute(text("SELECT name FROM schema_migrations")).scalars())
+    for name, step in MIGRATIONS:
+        if name in applied:
+            continue
+        # В только что созданной базе схема уже актуальна, шаги только отмечаются
+        if not fresh_database:
+            step(conn)
+        conn.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name})
+
+def has_schema(conn) -> bool:
+    return inspect(conn).has_table("transactions")
+
+async def migrate(target: AsyncEngine = engine):
+    async with target.begin() as conn:
+        fresh_database = not await conn.run_sync(has_schema)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(check_duplicate_users)
+        await conn.run_sync(create_indexes)
+        await conn.run_sync(apply_migrations, fresh_database)
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
+    print("Миграции применены")
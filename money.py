@@ -0,0 +1,25 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Денежные суммы хранятся в целых копейках, в приложении представлены Decimal с двумя знаками
+CENT = Decimal("0.01")
+
+# Наибольшая сумма по модулю: в копейках она с большим запасом помещается в BIGINT (9.2e18),
+# чтобы балансы и суммы по категориям тоже не переполнялись
+MAX_MONEY = Decimal("999999999999999.99")
+
+def to_money(value) -> Decimal:
+    if isinstance(value, float):
+        value = str(value)
+    try:
+        money = Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Некорректная денежная сумма: {value}")
+    if not money.is_finite() or abs(money) > MAX_MONEY:
+        raise ValueError(f"Денежная сумма должна быть по модулю не больше {MAX_MONEY}")
+    return money
+
+def to_cents(value) -> int:
+    return int(to_money(value) * 100)
+
+def from_cents(value) -> Decimal:
+    return Decimal(int(value)).scaleb(-2)
@@ -0,0 +1,162 @@
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from config import DEBUG, PROFILING_TOKEN, PROFILING_DIR, PROFILING_INTERVAL_MS
+
+logger = logging.getLogger(__name__)
+
+# Профилирование отдельного запроса по заголовку X-Profile: 1 или параметру ?profile=1.
+# Разрешено в режиме DEBUG или с заголовком X-Profile-Token, равным PROFILING_TOKEN; без этих
+# настроек middleware и хуки SQL не подключаются вовсе. Результат сохраняется в PROFILING_DIR:
+# <id>.folded - стеки в свернутом формате (flamegraph.pl, speedscope), время SQL отдельной ветвью "SQL",
+# <id>.json - сводка: общее время, время и число SQL-запросов, самые долгие запросы.
+# Имя профиля возвращается в заголовке X-Profile-Id.
+
+def profiling_available() -> bool:
+    return DEBUG or bool(PROFILING_TOKEN)
+
+# Семплирующий профайлер потока цикла событий: отдельный поток раз в interval снимает стек.
+# Семплы общие для потока, поэтому при параллельных запросах в профиль попадают и чужие корутины.
+class SamplingProfiler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame)] += 1
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class RequestProfile:
+    def __init__(self, profile_id: str):
+        self.profile_id = profile_id
+        self.queries = []
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+# Время SQL меряется хуками курсора: в стеках цикла событий ожидание БД выглядит как простой в select()
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        if profile is not None:
+            elapsed = time.perf_counter() - conn.info["profile_query_started"].pop()
+            profile.queries.append((" ".join(statement.split()), elapsed))
+
+def profile_requested(scope) -> bool:
+    headers = dict(scope["headers"])
+    if headers.get(b"x-profile") != b"1" and b"profile=1" not in scope.get("query_string", b"").split(b"&"):
+        return False
+    if DEBUG:
+        return True
+    token = headers.get(b"x-profile-token", b"").decode("latin-1")
+    return bool(PROFILING_TOKEN) and hmac.compare_digest(token, PROFILING_TOKEN)
+
+def write_profile(profile: RequestProfile, profiler: SamplingProfiler, scope, elapsed: float, status: int):
+    interval_ms = profiler.interval * 1000
+    sql_seconds = sum(seconds for _, seconds in profile.queries)
+    by_statement = {}
+    for statement, seconds in profile.queries:
+        count, total = by_statement.get(statement, (0, 0.0))
+        by_statement[statement] = (count + 1, total + seconds)
+
+    stacks = Counter(profiler.samples)
+    for statement, (_, total) in by_statement.items():
+        # В свернутом формате ";" разделяет кадры, пробел отделяет число семплов
+        stacks["SQL;" + statement[:300].replace(";", ",")] += max(round(total * 1000 / interval_ms), 1)
+
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    path = os.path.join(PROFILING_DIR, profile.profile_id)
+    with open(path + ".folded", "w", encoding="utf-8") as file:
+        file.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+    with open(path + ".json", "w", encoding="utf-8") as file:
+        json.dump({
+            "method": scope["method"],
+            "path": scope["path"],
+            "query_string": scope.get("query_string", b"").decode("latin-1"),
+            "status": status,
+            "total_ms": round(elapsed * 1000, 3),
+            "sql_ms": round(sql_seconds * 1000, 3),
+            "sql_queries": len(profile.queries),
+            "interval_ms": interval_ms,
+            "samples": sum(profiler.samples.values()),
+            "statements": [
+                {"statement": statement, "count": count, "total_ms": round(total * 1000, 3)}
+                for statement, (count, total) in sorted(by_statement.items(), key=lambda item: -item[1][1])
+            ],
+        }, file, ensure_ascii=False, indent=2)
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(f"{time.strftime('%Y%m%d-%H%M%S')}-{time.monotonic_ns() % 1_000_000:06d}")
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.profile_id.encode())
+                ]
+            await send(message)
+
+        token = current_profile.set(profile)
+        profiler = SamplingProfiler(PROFILING_INTERVAL_MS / 1000)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            elapsed = time.perf_counter() - started
+            current_profile.reset(token)
+            try:
+                write_profile(profile, profiler, scope, elapsed, status)
+            except OSError as e:
+                logger.error("Не удалось сохранить профиль %s: %s", profile.profile_id, e)
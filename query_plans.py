@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import Base, new_session
+from repository import (UserRepository, AccountRepository, TransactionRepository, CategoryRepository,
+                        FinancialGoalRepository, BudgetRepository)
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd, STransactionAdd, SFinancialGoalAdd, SBudgetAdd
+
+# Проверка через EXPLAIN QUERY PLAN, что запросы репозитория по горячим колонкам идут через индексы.
+# Запросы не собираются вручную: вызываются реальные методы репозитория на временной базе,
+# а выполненные ими SELECT, UPDATE и DELETE перехватываются и анализируются.
+# Запуск: python query_plans.py
+
+async def seed():
+    await UserRepository.add_user(SUserAdd(name="user", login="login", email="user@example.com",
+                                           password="password", code="0000"))
+    await AccountRepository.add_account(SAccountAdd(name="account", balance=0, user_id=1))
+    await CategoryRepository.add_category(SCategoryAdd(name="category"))
+    await BudgetRepository.add_budget(SBudgetAdd(name="budget", amount=100, wasted=0, date=date(2024, 1, 1),
+                                                 target_date=date(2024, 12, 31), user_id=1, account_id=1))
+    await FinancialGoalRepository.add_financial_goal(SFinancialGoalAdd(name="goal", desc=None, amount=0,
+                                                                       target_amount=100, target_date=None,
+                                                                       is_done=False, user_id=1))
+
+async def run_repository_queries():
+    await UserRepository.get_user_by_email("user@example.com")
+    await UserRepository.get_user_by_login("login")
+    await AccountRepository.get_accounts_by_user_id(1)
+    await AccountRepository.get_total_balance(1)
+    data = STransactionAdd(name="tx", description="", amount=10, date=date(2024, 6, 1), income=False,
+                           account_id=1, category_id=1)
+    transaction = await TransactionRepository.add_transaction(data)
+    await TransactionRepository.update_transaction(transaction.id, STransactionAdd(**{**data.model_dump(), "amount": 20}))
+    await TransactionRepository.get_transactions_by_account_id(1)
+    await TransactionRepository.get_transactions_income(1, False)
+    await TransactionRepository.get_transactions_sum_by_category(1, "Year", income=False)
+    await FinancialGoalRepository.get_financial_goals_by_user_id(1, False)
+    await BudgetRepository.get_budgets_by_user_id(1)
+    await AccountRepository.get_accounts_by_ids([1, 2])
+    await TransactionRepository.get_transactions_by_ids([transaction.id, 0])
+    await BudgetRepository.get_budgets_by_ids([1, 2])
+    await TransactionRepository.delete_transaction_by_id(transaction.id)
+
+# Строка плана без индекса: полный просмотр таблицы ("SCAN transactions"); подзапросы не учитываются
+def is_full_scan(detail: str) -> bool:
+    parts = detail.split()
+    return len(parts) >= 2 and parts[0] == "SCAN" and parts[1] in Base.metadata.tables and "USING" not in parts
+
+async def main() -> int:
+    db_path = os.path.join(tempfile.mkdtemp(), "query_plans.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    new_session.configure(bind=engine)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await seed()
+
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    await run_repository_queries()
+    await engine.dispose()
+
+    failed = 0
+    connection = sqlite3.connect(db_path)
+    for statement, parameters in statements:
+        plan = [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+        scans = [detail for detail in plan if is_full_scan(detail)]
+        print(("FAIL" if scans else "OK  ") + "  " + " ".join(statement.split()))
+        for detail in plan:
+            print("        " + detail)
+        failed += bool(scans)
+    connection.close()
+
+    print(f"\nЗапросов: {len(statements)}, без индекса: {failed}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
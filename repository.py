@@ -1,25 +1,260 @@
+import secrets
+from contextlib import asynccontextmanager
 from datetime import date, timedelta
+from decimal import Decimal
+from typing import AsyncIterator, Optional
 
 from fastapi import HTTPException
-from sqlalchemy import select, update, delete, func
-from sqlalchemy.exc import NoResultFound
+from sqlalchemy import select, update, delete, insert, func, bindparam, or_, case, literal
+from sqlalchemy.exc import NoResultFound, IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # from database import new_session, UserOrm
+from budget_index import budget_index
+from cache import cached, read_cache
 from database import new_session
-from database import UserOrm, AccountOrm, TransactionOrm, CategoryOrm, FinancialGoalOrm, BudgetOrm
+from metrics import instrument_repository
+from database import (UserOrm, AccountOrm, TransactionOrm, CategoryOrm, FinancialGoalOrm, BudgetOrm,
+                      TransactionRollupOrm)
 from schemas import (SUserAdd, SUser, SAccount, SAccountAdd, STransaction, STransactionAdd, SCategoryAdd, SCategory,
-                     SFinancialGoalAdd, SFinancialGoal, SBudget, SBudgetAdd)
-
+                     SFinancialGoalAdd, SFinancialGoal, SBudget, SBudgetAdd, SPage, SBatch)
+
+# Границы периода [начало, конец) для фильтров по дате; None - без ограничения
+def get_period_bounds(day: str) -> tuple[date, date] | None:
+    current_date = date.today()
+
+    if day == "Day":
+        return current_date, current_date + timedelta(days=1)
+    elif day == "Week":
+        start_date = current_date - timedelta(days=current_date.weekday())
+        return start_date, start_date + timedelta(days=7)
+    elif day == "Month":
+        start_date = current_date.replace(day=1)
+        return start_date, (start_date + timedelta(days=32)).replace(day=1)
+    elif day == "Year":
+        start_date = current_date.replace(month=1, day=1)
+        return start_date, start_date.replace(year=start_date.year + 1)
+    return None
+
+# Размер пачки строк, которую курсор БД отдает за раз при выгрузке
+EXPORT_BATCH_SIZE = 1000
+
+# Количество транзакций, записываемых одним коммитом при массовом импорте
+BULK_CHUNK_SIZE = 500
+
+# Сбой пачки массового импорта. Пачки до нее уже зафиксированы: inserted строк записано,
+# строки с номера index не записаны, errors - ошибки по строкам зафиксированных пачек
+class BulkImportError(Exception):
+    def __init__(self, inserted: int, index: int, errors: list[dict]):
+        super().__init__(f"Импорт остановлен на строке {index}, записано {inserted}")
+        self.inserted = inserted
+        self.index = index
+        self.errors = errors
+
+# Keyset-пагинация по id: стоимость страницы не зависит от глубины
+def paginate(query, model, limit: int, cursor: Optional[int]):
+    if cursor is not None:
+        query = query.where(model.id > cursor)
+    return query.order_by(model.id).limit(limit + 1)
+
+# Списки читаются колонками таблицы, без создания ORM-объектов; служебные колонки (info={"internal": True})
+# в схемы ответов не попадают
+def select_columns(model):
+    return select(*(column for column in model.__table__.columns if not column.info.get("internal")))
+
+# Схемы из строк БД без повторной валидации: типы уже приведены колонками (Money, Date),
+# поэтому model_construct безопасен и заметно быстрее model_validate на больших списках
+def construct_all(rows, schema) -> list:
+    return [schema.model_construct(**row._mapping) for row in rows]
+
+def build_page(rows, schema, limit: int) -> SPage:
+    items = construct_all(rows[:limit], schema)
+    next_cursor = items[-1].id if len(rows) > limit else None
+    return SPage.model_construct(items=items, next_cursor=next_cursor)
+
+# Записи по списку id в порядке запроса (повторы убираются), не найденные id - в missing
+def build_batch(rows, schema, ids: list[int]) -> SBatch:
+    found = {item.id: item for item in construct_all(rows, schema)}
+    ids = list(dict.fromkeys(ids))
+    return SBatch.model_construct(items=[found[item_id] for item_id in ids if item_id in found],
+                                  missing=[item_id for item_id in ids if item_id not in found])
+
+# Фильтр по диапазону значений колонки, границы включительно
+def where_between(query, column, low, high):
+    if low is not None:
+        query = query.where(column >= low)
+    if high is not None:
+        query = query.where(column <= high)
+    return query
+
+# Ошибка регистрации при занятой почте или логине
+def user_conflict_error(field: str, data: SUserAdd) -> HTTPException:
+    if field == "email":
+        return HTTPException(status_code=400, detail="Пользователь с почтой " + data.email + " зарегистрирован")
+    return HTTPException(status_code=400, detail="Пользователь с логином " + data.login + " зарегистрирован")
+
+# Теги кэша чтения, которые устаревают при изменении счета: сам счет, список и сумма счетов
+# владельца и его бюджеты (wasted меняется вместе с балансом)
+def account_cache_tags(account_id: int, user_id: Optional[int]) -> list[str]:
+    return [f"account:{account_id}", f"user:{user_id}:accounts", f"user:{user_id}:budgets"]
+
+# Увеличение строк transaction_rollups на заданные суммы (INSERT ... ON CONFLICT DO UPDATE).
+# rows: словари с ключами user_id, income, day, category_id, total, count
+async def upsert_rollups(session, rows: list[dict]):
+    if not rows:
+        return
+    dialect_insert = postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+    query = dialect_insert(TransactionRollupOrm)
+    query = query.on_conflict_do_update(
+        index_elements=[TransactionRollupOrm.user_id, TransactionRollupOrm.income,
+                        TransactionRollupOrm.day, TransactionRollupOrm.category_id],
+        set_={
+            "total": TransactionRollupOrm.total + query.excluded.total,
+            "count": TransactionRollupOrm.count + query.excluded.count,
+        }
+    )
+    await session.execute(query, rows)
+
+# Перенос агрегатов всех транзакций счета в rollup пользователя со знаком sign (1 - добавить, -1 - убрать)
+async def apply_account_rollups(session, account_id: int, user_id: int, sign: int):
+    result = await session.execute(
+        select(TransactionOrm.income, TransactionOrm.date, TransactionOrm.category_id,
+               func.sum(TransactionOrm.amount), func.count())
+        .where(TransactionOrm.account_id == account_id)
+        .group_by(TransactionOrm.income, TransactionOrm.date, TransactionOrm.category_id)
+    )
+    await upsert_rollups(session, [
+        {"user_id": user_id, "income": income, "day": day, "category_id": category_id,
+         "total": sign * total, "count": sign * count}
+        for income, day, category_id, total, count in result.all()
+    ])
+
+# Применение влияний транзакций (счет, дата, доход, сумма) к балансам счетов и wasted бюджетов.
+# Отрицательная сумма откатывает влияние. Разницы складываются по счетам и по бюджетам, и каждая таблица
+# обновляется одним UPDATE ... SET x = x + CASE id ... END; бюджеты с нулевой итоговой разницей не трогаются.
+# Возвращает владельцев найденных счетов: {account_id: user_id}.
+async def apply_balance_effects(session, effects: list[tuple[int, date, bool, Decimal]]) -> dict[int, int]:
+    balance_deltas = {}
+    for account_id, _, income, amount in effects:
+        balance_deltas[account_id] = balance_deltas.get(account_id, 0) + (amount if income else -amount)
+
+    query = (
+        update(AccountOrm)
+        .where(AccountOrm.id.in_(balance_deltas))
+        .values(balance=AccountOrm.balance + case(
+            {account_id: literal(delta, AccountOrm.balance.type) for account_id, delta in balance_deltas.items()},
+            value=AccountOrm.id
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    # Владельцы счетов нужны для rollup, ревизии бюджетов - для индекса окон: с RETURNING они приходят тем же запросом
+    columns = (AccountOrm.id, AccountOrm.user_id, AccountOrm.budgets_revision)
+    if session.bind.dialect.update_returning:
+        rows = (await session.execute(query.returning(*columns))).all()
+    else:
+        result = await session.execute(query)
+        rows = []
+        if result.rowcount:
+            rows = (await session.execute(select(*columns).where(AccountOrm.id.in_(balance_deltas)))).all()
+    accounts = {account_id: (user_id, budgets_revision) for account_id, user_id, budgets_revision in rows}
+
+    wasted_deltas = {}
+    for account_id, transaction_date, income, amount in effects:
+        if income or account_id not in accounts:
+            continue
+        for budget_id in await budget_index.covering(session, account_id, accounts[account_id][1], transaction_date):
+            wasted_deltas[budget_id] = wasted_deltas.get(budget_id, 0) + amount
+    wasted_deltas = {budget_id: delta for budget_id, delta in wasted_deltas.items() if delta}
+    if wasted_deltas:
+        await session.execute(
+            update(BudgetOrm)
+            .where(BudgetOrm.id.in_(wasted_deltas))
+            .values(wasted=BudgetOrm.wasted + case(
+                {budget_id: literal(delta, BudgetOrm.wasted.type) for budget_id, delta in wasted_deltas.items()},
+                value=BudgetOrm.id
+            ))
+            .execution_options(synchronize_session=False)
+        )
+    return {account_id: user_id for account_id, (user_id, _) in accounts.items()}
+
+# Применение суммы транзакции к счету, бюджетам и rollup. Отрицательная сумма откатывает влияние транзакции,
+# count - изменение числа транзакций в rollup (при category_id=None rollup не меняется).
+# Возвращает владельца счета или None, если счета нет.
+async def apply_transaction_effect(session, account_id: int, transaction_date: date, income: bool,
+                                   amount: Decimal, category_id: Optional[int] = None,
+                                   count: int = 0) -> Optional[int]:
+    user_id = (await apply_balance_effects(session, [(account_id, transaction_date, income, amount)])).get(account_id)
+    if user_id is None:
+        return None
+
+    if category_id is not None:
+        await upsert_rollups(session, [{"user_id": user_id, "income": income, "day": transaction_date,
+                                        "category_id": category_id, "total": amount, "count": count}])
+    return user_id
+
+# Смена ревизии бюджетов счетов: индекс окон перечитает их при следующей записи транзакции.
+# Ревизия случайная, чтобы не совпасть с сохраненной в индексе, если id счета будет использован повторно
+async def bump_budgets_revision(session, *account_ids: int):
+    await session.execute(
+        update(AccountOrm)
+        .where(AccountOrm.id.in_(set(account_ids)))
+        .values(budgets_revision=secrets.randbits(62))
+        .execution_options(synchronize_session=False)
+    )
+
+# Сессия на запрос (зависимость FastAPI): методы репозитория принимают ее параметром session,
+# работают в одной транзакции и одном соединении, а коммит и сброс кэша чтения выполняются
+# один раз после обработчика. При ошибке в обработчике все изменения запроса откатываются.
+async def get_session() -> AsyncIterator[AsyncSession]:
+    async with new_session() as session:
+        session.info["request_scoped"] = True
+        session.info["cache_tags"] = set()
+        yield session
+        await session.commit()
+        await read_cache.invalidate(*session.info["cache_tags"])
+
+# Переданная сессия запроса или собственная сессия метода, если метод вызван без нее
+@asynccontextmanager
+async def use_session(session: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    if session is not None:
+        yield session
+    else:
+        async with new_session() as session:
+            yield session
+
+# Фиксация изменений метода и сброс тегов кэша. В сессии запроса только flush: коммит и сброс
+# откладываются до конца запроса, чтобы кэш не заполнился данными до их фиксации
+async def commit(session: AsyncSession, *tags: str):
+    if session.info.get("request_scoped"):
+        await session.flush()
+        session.info["cache_tags"].update(tags)
+    else:
+        await session.commit()
+        await read_cache.invalidate(*tags)
+
+@instrument_repository
 class UserRepository:
     @classmethod
-    async def add_user(cls, data: SUserAdd) -> int:
-        async with new_session() as session:
+    async def add_user(cls, data: SUserAdd, session: Optional[AsyncSession] = None) -> int:
+        async with use_session(session) as session:
             user_dict = data.model_dump()
 
             user = UserOrm(name=data.name, email=data.email, login=data.login, password=data.password, code=data.code)
             session.add(user)
-            await session.flush()
-            await session.commit()
+            # Уникальные индексы на email и login делают вставку атомарной проверкой на дубликаты
+            try:
+                await session.flush()
+            except IntegrityError as e:
+                await session.rollback()
+                message = str(e.orig).lower()
+                if "email" in message:
+                    raise user_conflict_error("email", data)
+                if "login" in message:
+                    raise user_conflict_error("login", data)
+                raise
+            # Отсутствие пользователя с этим логином тоже могло попасть в кэш
+            await commit(session, f"login:{data.login}")
             # Преобразование объекта пользователя в словарь
             user_data = {
                 "name": user.name,
@@ -32,17 +267,16 @@ class UserRepository:
             return user_data
 
     @classmethod
-    async def get_users(cls) -> list[SUser]:
-        async with new_session() as session:
-            query = select(UserOrm)
+    async def get_users(cls, limit: int, cursor: Optional[int] = None,
+                        session: Optional[AsyncSession] = None) -> SPage[SUser]:
+        async with use_session(session) as session:
+            query = paginate(select_columns(UserOrm), UserOrm, limit, cursor)
             result = await session.execute(query)
-            user_models = result.scalars().all()
-            user_schemas = [SUser.model_validate(user_model) for user_model in user_models]
-            return user_schemas
+            return build_page(result.all(), SUser, limit)
 
     @classmethod
-    async def get_user_by_email(cls, email):
-        async with new_session() as session:
+    async def get_user_by_email(cls, email, session: Optional[AsyncSession] = None):
+        async with use_session(session) as session:
             query = select(UserOrm).where(UserOrm.email == email)
             result = await session.execute(query)
             user_model = result.scalar()
@@ -52,9 +286,26 @@ class UserRepository:
             else:
                 return None
 
+    # Проверка почты и логина одним запросом; возвращает занятое поле ("email" имеет приоритет) или None
     @classmethod
-    async def get_user_by_login(cls, login):
-        async with new_session() as session:
+    async def get_registration_conflict(cls, email: str, login: str,
+                                        session: Optional[AsyncSession] = None) -> Optional[str]:
+        async with use_session(session) as session:
+            query = select(UserOrm.email, UserOrm.login).where(
+                or_(UserOrm.email == email, UserOrm.login == login)
+            )
+            result = await session.execute(query)
+            rows = result.all()
+            if any(row.email == email for row in rows):
+                return "email"
+            if rows:
+                return "login"
+            return None
+
+    @classmethod
+    @cached("login:{login}")
+    async def get_user_by_login(cls, login, session: Optional[AsyncSession] = None) -> Optional[SUser]:
+        async with use_session(session) as session:
             query = select(UserOrm).where(UserOrm.login == login)
             result = await session.execute(query)
             user_model = result.scalar()
@@ -65,44 +316,45 @@ class UserRepository:
                 return None
 
     @classmethod
-    async def update_password(cls, email: str, new_password: str):
-        async with new_session() as session:
+    async def update_password(cls, email: str, new_password: str, session: Optional[AsyncSession] = None):
+        async with use_session(session) as session:
             query = select(UserOrm).where(UserOrm.email == email)
             result = await session.execute(query)
             user_model = result.scalar()
             if user_model:
                 user_model.password = new_password
-                await session.commit()
+                await commit(session, f"login:{user_model.login}")
                 return True
             else:
                 return False
 
     @classmethod
-    async def update_verification_code(cls, email: str, new_code: str):
-        async with new_session() as session:
+    async def update_verification_code(cls, email: str, new_code: str, session: Optional[AsyncSession] = None):
+        async with use_session(session) as session:
             query = select(UserOrm).where(UserOrm.email == email)
             result = await session.execute(query)
             user_model = result.scalar()
             if user_model:
                 user_model.code = new_code
-                await session.commit()
+                await commit(session, f"login:{user_model.login}")
                 return True
             else:
                 return False
 
+@instrument_repository
 class AccountRepository:
     @classmethod
-    async def add_account(cls, data: SAccountAdd) -> dict:
-        async with new_session() as session:
+    async def add_account(cls, data: SAccountAdd, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             account = AccountOrm(**data.dict())
             session.add(account)
             await session.flush()
-            await session.commit()
+            await commit(session, f"user:{data.user_id}:accounts")
             return account
 
     @classmethod
-    async def update_account(cls, account_id: int, data: SAccountAdd) -> dict:
-        async with new_session() as session:
+    async def update_account(cls, account_id: int, data: SAccountAdd, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             query = select(AccountOrm).where(AccountOrm.id == account_id)
             result = await session.execute(query)
             account = result.scalar()
@@ -110,48 +362,74 @@ class AccountRepository:
             if not account:
                 raise HTTPException(status_code=404, detail="Account not found")
 
+            old_user_id = account.user_id
+            # При смене владельца агрегаты транзакций счета переносятся в rollup нового пользователя
+            if data.user_id != account.user_id:
+                await apply_account_rollups(session, account_id, account.user_id, -1)
+                await apply_account_rollups(session, account_id, data.user_id, 1)
+
             for field, value in data.dict().items():
                 setattr(account, field, value)
 
-            await session.commit()
+            await commit(session, *account_cache_tags(account_id, old_user_id),
+                         *account_cache_tags(account_id, data.user_id))
             return account
 
     @classmethod
-    async def delete_account(cls, account_id: int) -> dict:
-        async with new_session() as session:
-            query = delete(AccountOrm).where(AccountOrm.id == account_id)
-            result = await session.execute(query)
-            await session.commit()
+    async def delete_account(cls, account_id: int, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
+            user_id = (await session.execute(select(AccountOrm.user_id).where(AccountOrm.id == account_id))).scalar()
+            if user_id is None:
+                raise NoResultFound(f"Account with id {account_id} not found")
+            await apply_account_rollups(session, account_id, user_id, -1)
+
+            # Транзакции и бюджеты счета удаляются вместе с ним (как каскад связей AccountOrm):
+            # внешние ключи не дают удалить счет раньше зависимых строк
+            await session.execute(delete(TransactionOrm).where(TransactionOrm.account_id == account_id))
+            await session.execute(delete(BudgetOrm).where(BudgetOrm.account_id == account_id))
+            await session.execute(delete(AccountOrm).where(AccountOrm.id == account_id))
+            await commit(session, *account_cache_tags(account_id, user_id))
             return {"message": "Account deleted successfully", "account_id": account_id}
 
     @classmethod
-    async def get_accounts_by_user_id(cls, user_id: int) -> list[AccountOrm]:
-        async with new_session() as session:
-            query = select(AccountOrm).where(AccountOrm.user_id == user_id)
+    @cached("user:{user_id}:accounts")
+    async def get_accounts_by_user_id(cls, user_id: int, session: Optional[AsyncSession] = None) -> list[SAccount]:
+        async with use_session(session) as session:
+            query = select_columns(AccountOrm).where(AccountOrm.user_id == user_id)
             result = await session.execute(query)
-            accounts = result.scalars().all()
-            return accounts
+            # В кэше хранятся схемы, а не ORM-объекты, привязанные к закрытой сессии
+            return construct_all(result.all(), SAccount)
 
     @classmethod
-    async def get_accounts(cls) -> list[SAccount]:
-        async with new_session() as session:
-            query = select(AccountOrm)
+    async def get_accounts(cls, limit: int, cursor: Optional[int] = None,
+                           min_balance: Optional[Decimal] = None, max_balance: Optional[Decimal] = None,
+                           session: Optional[AsyncSession] = None) -> SPage[SAccount]:
+        async with use_session(session) as session:
+            query = where_between(select_columns(AccountOrm), AccountOrm.balance, min_balance, max_balance)
+            query = paginate(query, AccountOrm, limit, cursor)
             result = await session.execute(query)
-            accounts_models = result.scalars().all()
-            account_schemas = [SAccount.model_validate(account_models) for account_models in accounts_models]
-            return account_schemas
+            return build_page(result.all(), SAccount, limit)
 
+    # Счета по списку id одним запросом WHERE id IN (...)
     @classmethod
-    async def get_total_balance(cls, user_id: int) -> float:
-        async with new_session() as session:
+    async def get_accounts_by_ids(cls, ids: list[int], session: Optional[AsyncSession] = None) -> SBatch[SAccount]:
+        async with use_session(session) as session:
+            result = await session.execute(select_columns(AccountOrm).where(AccountOrm.id.in_(ids)))
+            return build_batch(result.all(), SAccount, ids)
+
+    @classmethod
+    @cached("user:{user_id}:accounts")
+    async def get_total_balance(cls, user_id: int, session: Optional[AsyncSession] = None) -> Decimal:
+        async with use_session(session) as session:
             query = select(func.sum(AccountOrm.balance)).where(AccountOrm.user_id == user_id)
             result = await session.execute(query)
             total_balance = result.scalar()
-            return total_balance if total_balance is not None else 0.0
+            return total_balance if total_balance is not None else Decimal("0.00")
 
     @classmethod
-    async def get_account_by_id(cls, account_id: int) -> SAccount:
-        async with new_session() as session:
+    @cached("account:{account_id}")
+    async def get_account_by_id(cls, account_id: int, session: Optional[AsyncSession] = None) -> SAccount:
+        async with use_session(session) as session:
             query = select(AccountOrm).where(AccountOrm.id == account_id)
             result = await session.execute(query)
             account_model = result.scalar()
@@ -161,44 +439,34 @@ class AccountRepository:
             else:
                 raise HTTPException(status_code=404, detail="Account not found")
 
+@instrument_repository
 class TransactionRepository:
     @classmethod
-    async def add_transaction(cls, data: STransactionAdd) -> dict:
-        async with new_session() as session:
+    async def add_transaction(cls, data: STransactionAdd, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             # Создание объекта транзакции
             transaction = TransactionOrm(**data.dict())
             session.add(transaction)
-
-            # Получение счета, связанного с транзакцией
-            query = select(AccountOrm).where(AccountOrm.id == data.account_id)
-            result = await session.execute(query)
-            account = result.scalar()
-
-            if not account:
+            # СУБД с проверкой внешних ключей отклоняет вставку с несуществующим счетом или категорией
+            try:
+                await session.flush()
+            except IntegrityError:
+                await session.rollback()
+                # SQLite не называет колонку в ошибке внешнего ключа, поэтому отсутствующая запись ищется запросом
+                if await session.get(AccountOrm, data.account_id) is None:
+                    raise HTTPException(status_code=404, detail="Account not found")
+                if await session.get(CategoryOrm, data.category_id) is None:
+                    raise HTTPException(status_code=404, detail="Category not found")
+                raise
+
+            # Обновление баланса счета и wasted бюджетов одним UPDATE на таблицу
+            user_id = await apply_transaction_effect(session, data.account_id, data.date, data.income, data.amount,
+                                                     data.category_id, 1)
+            if user_id is None:
                 raise HTTPException(status_code=404, detail="Account not found")
 
-            # Обновление баланса счета
-            if data.income:
-                account.balance += data.amount
-            else:
-                account.balance -= data.amount
-
-            # Получение бюджета, связанного с транзакцией, и обновление его поля wasted
-            budget_query = select(BudgetOrm).where(
-                BudgetOrm.account_id == data.account_id,
-                BudgetOrm.date <= transaction.date,
-                BudgetOrm.target_date >= transaction.date
-            )
-            budget_result = await session.execute(budget_query)
-            budget = budget_result.scalar()
-
-            if budget:
-                if data.income == False:
-                    budget.wasted += data.amount
-
             # Сохранение изменений в базе данных
-            await session.flush()
-            await session.commit()
+            await commit(session, *account_cache_tags(data.account_id, user_id))
 
             return transaction
     # async def add_transaction(cls, data: STransactionAdd) -> dict:
@@ -210,91 +478,202 @@ class TransactionRepository:
     #         return transaction
 
     @classmethod
-    async def get_transactions_by_account_id(cls, account_id: int) -> list[TransactionOrm]:
-        async with new_session() as session:
-            query = select(TransactionOrm).where(TransactionOrm.account_id == account_id)
-            result = await session.execute(query)
-            transactions = result.scalars().all()
-            return transactions
+    async def add_transactions_bulk(cls, rows: list[STransactionAdd], chunk_size: int = BULK_CHUNK_SIZE) -> dict:
+        # Импорт пачками: одна вставка executemany на пачку, баланс счета, wasted бюджета
+        # и rollup обновляются один раз на пачку суммарной разницей
+        inserted = 0
+        errors = []
+        async with new_session() as session:
+            for chunk_start in range(0, len(rows), chunk_size):
+                chunk = rows[chunk_start:chunk_start + chunk_size]
+                chunk_errors = []
+                try:
+                    account_ids = {row.account_id for row in chunk}
+                    category_ids = {row.category_id for row in chunk}
+
+                    accounts = (await session.execute(
+                        select(AccountOrm.id, AccountOrm.user_id, AccountOrm.budgets_revision)
+                        .where(AccountOrm.id.in_(account_ids))
+                    )).all()
+                    account_users = {account.id: account.user_id for account in accounts}
+                    budget_windows = {
+                        account.id: await budget_index.windows(session, account.id, account.budgets_revision)
+                        for account in accounts
+                    }
+                    existing_categories = set((await session.execute(
+                        select(CategoryOrm.id).where(CategoryOrm.id.in_(category_ids))
+                    )).scalars())
+
+                    values = []
+                    balance_deltas = {}
+                    wasted_deltas = {}
+                    rollup_deltas = {}
+                    for offset, row in enumerate(chunk):
+                        index = chunk_start + offset
+                        if row.account_id not in account_users:
+                            chunk_errors.append({"index": index, "detail": "Account not found"})
+                            continue
+                        if row.category_id not in existing_categories:
+                            chunk_errors.append({"index": index, "detail": "Category not found"})
+                            continue
+
+                        values.append(row.dict())
+                        delta = row.amount if row.income else -row.amount
+                        balance_deltas[row.account_id] = balance_deltas.get(row.account_id, 0) + delta
+
+                        rollup_key = (account_users[row.account_id], row.income, row.date, row.category_id)
+                        total, count = rollup_deltas.get(rollup_key, (0, 0))
+                        rollup_deltas[rollup_key] = (total + row.amount, count + 1)
+
+                        if not row.income:
+                            # Как и в add_transaction, учитываются все бюджеты, покрывающие дату транзакции
+                            for budget_id in budget_windows[row.account_id].covering(row.date):
+                                wasted_deltas[budget_id] = wasted_deltas.get(budget_id, 0) + row.amount
+
+                    if values:
+                        await session.execute(insert(TransactionOrm), values)
+                    if balance_deltas:
+                        await session.execute(
+                            update(AccountOrm.__table__)
+                            .where(AccountOrm.__table__.c.id == bindparam("account_id"))
+                            .values(balance=AccountOrm.__table__.c.balance + bindparam("delta")),
+                            [{"account_id": account_id, "delta": delta}
+                             for account_id, delta in balance_deltas.items()]
+                        )
+                    if wasted_deltas:
+                        await session.execute(
+                            update(BudgetOrm.__table__)
+                            .where(BudgetOrm.__table__.c.id == bindparam("budget_id"))
+                            .values(wasted=BudgetOrm.__table__.c.wasted + bindparam("delta")),
+                            [{"budget_id": budget_id, "delta": delta} for budget_id, delta in wasted_deltas.items()]
+                        )
+                    await upsert_rollups(session, [
+                        {"user_id": user_id, "income": income, "day": day, "category_id": category_id,
+                         "total": total, "count": count}
+                        for (user_id, income, day, category_id), (total, count) in rollup_deltas.items()
+                    ])
+                    await session.commit()
+                except Exception as e:
+                    await session.rollback()
+                    raise BulkImportError(inserted, chunk_start, errors) from e
+                errors.extend(chunk_errors)
+                inserted += len(values)
+                for account_id in balance_deltas:
+                    await read_cache.invalidate(*account_cache_tags(account_id, account_users[account_id]))
+
+        return {"inserted": inserted, "errors": errors}
+
+    @classmethod
+    async def get_transactions_by_account_id(cls, account_id: int,
+                                             session: Optional[AsyncSession] = None) -> list[STransaction]:
+        async with use_session(session) as session:
+            query = select_columns(TransactionOrm).where(TransactionOrm.account_id == account_id)
+            result = await session.execute(query)
+            return construct_all(result.all(), STransaction)
+
+    @classmethod
+    async def stream_transactions(cls, user_id: Optional[int] = None,
+                                  account_id: Optional[int] = None) -> AsyncIterator[list[dict]]:
+        # Потоковая выгрузка пачками: в памяти одновременно не больше EXPORT_BATCH_SIZE строк
+        async with new_session() as session:
+            query = select(
+                TransactionOrm.id, TransactionOrm.name, TransactionOrm.description, TransactionOrm.amount,
+                TransactionOrm.date, TransactionOrm.income, TransactionOrm.account_id, TransactionOrm.category_id
+            )
+            if user_id is not None:
+                query = query.join(AccountOrm).where(AccountOrm.user_id == user_id)
+            if account_id is not None:
+                query = query.where(TransactionOrm.account_id == account_id)
+            query = query.order_by(TransactionOrm.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+            result = await session.stream(query)
+            async for rows in result.mappings().partitions():
+                yield rows
 
     @classmethod
-    async def get_transactions_income(cls, account_id: int, income: bool) -> list[TransactionOrm]:
-        async with new_session() as session:
-            query = select(TransactionOrm).where(TransactionOrm.account_id == account_id)
+    async def get_transactions_income(cls, account_id: int, income: bool,
+                                      session: Optional[AsyncSession] = None) -> list[STransaction]:
+        async with use_session(session) as session:
+            query = select_columns(TransactionOrm).where(TransactionOrm.account_id == account_id)
             if income:
                 query = query.where(TransactionOrm.income == True)  # True для явного указания на поле income == True
             else:
                 query = query.where(TransactionOrm.income == False)  # False для явного указания на поле income == False
 
             result = await session.execute(query)
-            transactions_models = result.scalars().all()
-            transaction_schemas = [STransaction.model_validate(transaction_models) for transaction_models in
-                                   transactions_models]
-            return transaction_schemas
+            return construct_all(result.all(), STransaction)
 
     @classmethod
-    async def get_transactions(cls) -> list[STransaction]:
-        async with new_session() as session:
-            query = select(TransactionOrm)
+    async def get_transactions(cls, limit: int, cursor: Optional[int] = None,
+                               date_from: Optional[date] = None, date_to: Optional[date] = None,
+                               min_amount: Optional[Decimal] = None,
+                               max_amount: Optional[Decimal] = None,
+                               session: Optional[AsyncSession] = None) -> SPage[STransaction]:
+        async with use_session(session) as session:
+            query = where_between(select_columns(TransactionOrm), TransactionOrm.date, date_from, date_to)
+            query = where_between(query, TransactionOrm.amount, min_amount, max_amount)
+            query = paginate(query, TransactionOrm, limit, cursor)
             result = await session.execute(query)
-            transactions_models = result.scalars().all()
-            transaction_schemas = [STransaction.model_validate(transaction_models) for transaction_models in transactions_models]
-            return transaction_schemas
+            return build_page(result.all(), STransaction, limit)
 
     @classmethod
-    async def get_transaction_by_id(cls, transaction_id: int) -> STransactionAdd:
-        async with new_session() as session:
+    async def get_transactions_by_ids(cls, ids: list[int],
+                                      session: Optional[AsyncSession] = None) -> SBatch[STransaction]:
+        async with use_session(session) as session:
+            result = await session.execute(select_columns(TransactionOrm).where(TransactionOrm.id.in_(ids)))
+            return build_batch(result.all(), STransaction, ids)
+
+    @classmethod
+    async def get_transaction_by_id(cls, transaction_id: int,
+                                    session: Optional[AsyncSession] = None) -> STransactionAdd:
+        async with use_session(session) as session:
             query = select(TransactionOrm).where(TransactionOrm.id == transaction_id)
             result = await session.execute(query)
             transaction = result.scalar()
             return transaction
 
     @classmethod
-    async def delete_transaction_by_id(cls, transaction_id: int):
-        async with new_session() as session:
-            query = select(TransactionOrm).where(TransactionOrm.id == transaction_id)
-            result = await session.execute(query)
-            transaction = result.scalar()
+    async def delete_transaction_by_id(cls, transaction_id: int, session: Optional[AsyncSession] = None):
+        async with use_session(session) as session:
+            columns = (TransactionOrm.account_id, TransactionOrm.date, TransactionOrm.income, TransactionOrm.amount,
+                       TransactionOrm.category_id)
+
+            # Удаление транзакции с получением ее данных тем же запросом, если СУБД поддерживает RETURNING
+            if session.bind.dialect.delete_returning:
+                result = await session.execute(
+                    delete(TransactionOrm).where(TransactionOrm.id == transaction_id).returning(*columns)
+                )
+                transaction = result.first()
+            else:
+                result = await session.execute(select(*columns).where(TransactionOrm.id == transaction_id))
+                transaction = result.first()
+                if transaction:
+                    result = await session.execute(
+                        delete(TransactionOrm).where(
+                            TransactionOrm.id == transaction_id,
+                            *(column == value for column, value in zip(columns, transaction))
+                        )
+                    )
+                    if result.rowcount == 0:
+                        raise HTTPException(status_code=409, detail="Transaction was modified concurrently")
 
             if not transaction:
                 raise HTTPException(status_code=404, detail="Transaction not found")
 
-            # Получение счёта, связанного с транзакцией
-            query_account = select(AccountOrm).where(AccountOrm.id == transaction.account_id)
-            result_account = await session.execute(query_account)
-            account = result_account.scalar()
-
-            if not account:
+            # Откат влияния транзакции на баланс счёта и бюджеты
+            user_id = await apply_transaction_effect(session, transaction.account_id, transaction.date,
+                                                     transaction.income, -transaction.amount,
+                                                     transaction.category_id, -1)
+            if user_id is None:
                 raise HTTPException(status_code=404, detail="Account not found")
 
-            # Обновление баланса счёта в зависимости от значения income транзакции
-            if transaction.income:
-                account.balance -= transaction.amount  # Вычитаем сумму транзакции из баланса
-            else:
-                account.balance += transaction.amount  # Прибавляем сумму транзакции к балансу
-
-            # Получение бюджета, связанного с транзакцией
-            budget_query = select(BudgetOrm).where(
-                BudgetOrm.account_id == transaction.account_id,
-                BudgetOrm.date <= transaction.date,
-                BudgetOrm.target_date >= transaction.date
-            )
-            budget_result = await session.execute(budget_query)
-            budget = budget_result.scalar()
-
-            if budget:
-                if transaction.income == False:
-                    budget.wasted -= transaction.amount
-
-            # Удаление транзакции из базы данных
-            await session.delete(transaction)
-
             # Сохранение изменений в базе данных
-            await session.commit()
+            await commit(session, *account_cache_tags(transaction.account_id, user_id))
 
     @classmethod
-    async def update_transaction(cls, transaction_id: int, updated_data: STransactionAdd) -> dict:
-        async with new_session() as session:
+    async def update_transaction(cls, transaction_id: int, updated_data: STransactionAdd,
+                                 session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             query = select(TransactionOrm).where(TransactionOrm.id == transaction_id)
             result = await session.execute(query)
             transaction = result.scalar()
@@ -302,49 +681,58 @@ class TransactionRepository:
             if not transaction:
                 raise HTTPException(status_code=404, detail="Transaction not found")
 
-            # Получение счёта, связанного с транзакцией
-            query_account = select(AccountOrm).where(AccountOrm.id == transaction.account_id)
-            result_account = await session.execute(query_account)
-            account = result_account.scalar()
-
-            if not account:
-                raise HTTPException(status_code=404, detail="Account not found")
-
-            # Вычисление изменения суммы транзакции
+            old_account_id = transaction.account_id
+            old_date = transaction.date
+            old_income = transaction.income
             old_amount = transaction.amount
-            new_amount = updated_data.amount
-            amount_difference = abs(new_amount - old_amount)
-
-            # Обновление баланса счёта в зависимости от значения поля income
-            if transaction.income:
-                account.balance -= old_amount
-                account.balance += new_amount
-            else:
-                account.balance += old_amount
-                account.balance -= new_amount
-
-            # Получение бюджета, связанного с транзакцией
-            budget_query = select(BudgetOrm).where(
-                BudgetOrm.account_id == transaction.account_id,
-                BudgetOrm.date <= transaction.date,
-                BudgetOrm.target_date >= transaction.date
+            old_category_id = transaction.category_id
+
+            # Обновление строки только если она не изменилась с момента чтения (защита от потерянного обновления)
+            result = await session.execute(
+                update(TransactionOrm)
+                .where(
+                    TransactionOrm.id == transaction_id,
+                    TransactionOrm.account_id == old_account_id,
+                    TransactionOrm.date == old_date,
+                    TransactionOrm.income == old_income,
+                    TransactionOrm.amount == old_amount,
+                    TransactionOrm.category_id == old_category_id,
+                )
+                .values(**updated_data.dict())
+                .execution_options(synchronize_session=False)
             )
-            budget_result = await session.execute(budget_query)
-            budget = budget_result.scalar()
+            if result.rowcount == 0:
+                raise HTTPException(status_code=409, detail="Transaction was modified concurrently")
+
+            # Старое влияние откатывается, новое применяется: счет, дата и тип могут измениться,
+            # разницы по обоим счетам и обоим окнам бюджетов сводятся в один UPDATE на таблицу
+            account_users = await apply_balance_effects(session, [
+                (old_account_id, old_date, old_income, -old_amount),
+                (updated_data.account_id, updated_data.date, updated_data.income, updated_data.amount),
+            ])
+            if old_account_id not in account_users or updated_data.account_id not in account_users:
+                raise HTTPException(status_code=404, detail="Account not found")
+            user_id = account_users[old_account_id]
+            new_user_id = account_users[updated_data.account_id]
+
+            # Перенос транзакции в rollup: убрать из старой группы и добавить в новую
+            old_key = {"user_id": user_id, "income": old_income, "day": old_date, "category_id": old_category_id}
+            new_key = {"user_id": new_user_id, "income": updated_data.income, "day": updated_data.date,
+                       "category_id": updated_data.category_id}
+            if old_key == new_key:
+                await upsert_rollups(session, [{**new_key, "total": updated_data.amount - old_amount, "count": 0}])
+            else:
+                await upsert_rollups(session, [{**old_key, "total": -old_amount, "count": -1},
+                                               {**new_key, "total": updated_data.amount, "count": 1}])
 
-            if budget:
-                # Вычесть старую сумму из бюджета
-                if transaction.income == False:
-                    budget.wasted -= old_amount
-                    budget.wasted += new_amount
+            # Сохраняем изменения в балансе счёта и транзакции в базе данных
+            await commit(session, *account_cache_tags(old_account_id, user_id),
+                         *account_cache_tags(updated_data.account_id, new_user_id))
 
-            # Обновляем данные транзакции на основе переданных данных
+            # Объект отсоединяется от сессии: изменение полей не должно порождать повторный UPDATE при коммите
+            session.expunge(transaction)
             for field, value in updated_data.dict().items():
                 setattr(transaction, field, value)
-
-            # Сохраняем изменения в балансе счёта и транзакции в базе данных
-            await session.commit()
-
             return transaction
 
     # @classmethod
@@ -378,88 +766,61 @@ class TransactionRepository:
     #         return transactions_sum_by_category
 
     @classmethod
-    async def get_income_transactions_sum_by_category(cls, user_id: int, day: str) -> dict:
-        async with new_session() as session:
-            query = select(TransactionOrm.amount, CategoryOrm.name).join(AccountOrm).join(CategoryOrm).where(
-                AccountOrm.user_id == user_id, TransactionOrm.income == True)
-
-            current_date = date.today()
-
-            if day == "Day":
-                query = query.where(func.date(TransactionOrm.date) == current_date)
-            elif day == "Week":
-                start_date = current_date - timedelta(days=current_date.weekday())
-                query = query.where(func.date(TransactionOrm.date) >= start_date)
-            elif day == "Month":
-                start_date = current_date.replace(day=1)
-                query = query.where(func.date(TransactionOrm.date) >= start_date)
-            elif day == "Year":
-                start_date = current_date.replace(month=1, day=1)
-                query = query.where(func.date(TransactionOrm.date) >= start_date)
-
-            result = await session.execute(query)
-            transactions = result.fetchall()
+    async def get_transactions_sum_by_category(cls, user_id: int, day: str, income: bool,
+                                               session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
+            # Суммы читаются из transaction_rollups: не больше одной строки на день и категорию
+            sums_query = select(
+                TransactionRollupOrm.category_id,
+                func.sum(TransactionRollupOrm.total).label("total")
+            ).where(
+                TransactionRollupOrm.user_id == user_id,
+                TransactionRollupOrm.income == income,
+                TransactionRollupOrm.count > 0
+            )
 
-            transactions_sum_by_category = {}
-            for amount, category_name in transactions:
-                transactions_sum_by_category[category_name] = transactions_sum_by_category.get(category_name,
-                                                                                               0) + amount
+            period = get_period_bounds(day)
+            if period:
+                start_date, end_date = period
+                sums_query = sums_query.where(TransactionRollupOrm.day >= start_date,
+                                              TransactionRollupOrm.day < end_date)
 
-            return transactions_sum_by_category
-
-    @classmethod
-    async def get_expense_transactions_sum_by_category(cls, user_id: int, day: str) -> dict:
-        async with new_session() as session:
-            query = select(TransactionOrm.amount, CategoryOrm.name).join(AccountOrm).join(CategoryOrm).where(
-                AccountOrm.user_id == user_id, TransactionOrm.income == False)
-
-            current_date = date.today()
-
-            if day == "Day":
-                query = query.where(func.date(TransactionOrm.date) == current_date)
-            elif day == "Week":
-                start_date = current_date - timedelta(days=current_date.weekday())
-                query = query.where(func.date(TransactionOrm.date) >= start_date)
-            elif day == "Month":
-                start_date = current_date.replace(day=1)
-                query = query.where(func.date(TransactionOrm.date) >= start_date)
-            elif day == "Year":
-                start_date = current_date.replace(month=1, day=1)
-                query = query.where(func.date(TransactionOrm.date) >= start_date)
+            sums = sums_query.group_by(TransactionRollupOrm.category_id).subquery()
+            query = select(CategoryOrm.name, sums.c.total).join(sums, CategoryOrm.id == sums.c.category_id)
 
             result = await session.execute(query)
-            transactions = result.fetchall()
 
+            # Категории с одинаковым названием объединяются, как и раньше
             transactions_sum_by_category = {}
-            for amount, category_name in transactions:
+            for category_name, total in result.all():
                 transactions_sum_by_category[category_name] = transactions_sum_by_category.get(category_name,
-                                                                                               0) + amount
+                                                                                               0) + total
 
             return transactions_sum_by_category
 
+@instrument_repository
 class CategoryRepository:
     @classmethod
-    async def add_category(cls, data: SCategoryAdd) -> dict:
-        async with new_session() as session:
+    async def add_category(cls, data: SCategoryAdd, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             category = CategoryOrm(**data.dict())
             session.add(category)
             await session.flush()
-            await session.commit()
+            await commit(session, "categories")
             return category
 
     @classmethod
-    async def get_categories(cls) -> list[SCategory]:
-        async with new_session() as session:
-            query = select(CategoryOrm)
+    @cached("categories")
+    async def get_categories(cls, limit: int, cursor: Optional[int] = None,
+                             session: Optional[AsyncSession] = None) -> SPage[SCategory]:
+        async with use_session(session) as session:
+            query = paginate(select_columns(CategoryOrm), CategoryOrm, limit, cursor)
             result = await session.execute(query)
-            categories_models = result.scalars().all()
-            category_schemas = [SCategory.model_validate(category_models) for category_models in
-                                   categories_models]
-            return category_schemas
+            return build_page(result.all(), SCategory, limit)
 
     @classmethod
-    async def delete_category(cls, category_id: int) -> dict:
-        async with new_session() as session:
+    async def delete_category(cls, category_id: int, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             query = select(CategoryOrm).where(CategoryOrm.id == category_id)
             result = await session.execute(query)
             category = result.scalars().first()
@@ -467,47 +828,55 @@ class CategoryRepository:
             if category is None:
                 raise NoResultFound(f"Category with id {category_id} not found")
 
+            # Агрегаты удаляются раньше категории: иначе автофлаш удалил бы категорию, на которую они ссылаются
+            await session.execute(delete(TransactionRollupOrm).where(TransactionRollupOrm.category_id == category_id))
             await session.delete(category)
-            await session.commit()
+            await commit(session, "categories")
             return {"message": "Category deleted successfully", "category_id": category_id}
 
+@instrument_repository
 class FinancialGoalRepository:
     @classmethod
-    async def add_financial_goal(cls, data: SFinancialGoalAdd) -> dict:
-        async with new_session() as session:
+    async def add_financial_goal(cls, data: SFinancialGoalAdd, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             financial_goal = FinancialGoalOrm(**data.dict())
             session.add(financial_goal)
             await session.flush()
-            await session.commit()
+            await commit(session, f"user:{data.user_id}:goals")
             return financial_goal
 
     @classmethod
-    async def update_financial_goal(cls, goal_id: int, data: SFinancialGoalAdd) -> dict:
-        async with new_session() as session:
+    async def update_financial_goal(cls, goal_id: int, data: SFinancialGoalAdd,
+                                    session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             query = select(FinancialGoalOrm).where(FinancialGoalOrm.id == goal_id)
             result = await session.execute(query)
             financial_goal = result.scalar()
 
             if not financial_goal:
                 raise HTTPException(status_code=404, detail="Financial goal not found")
+            old_user_id = financial_goal.user_id
 
             for field, value in data.dict().items():
                 setattr(financial_goal, field, value)
 
-            await session.commit()
+            await commit(session, f"user:{old_user_id}:goals", f"user:{data.user_id}:goals")
             return financial_goal
 
     @classmethod
-    async def delete_financial_goal(cls, goal_id: int) -> dict:
-        async with new_session() as session:
+    async def delete_financial_goal(cls, goal_id: int, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
+            user_id = (await session.execute(
+                select(FinancialGoalOrm.user_id).where(FinancialGoalOrm.id == goal_id)
+            )).scalar()
             query = delete(FinancialGoalOrm).where(FinancialGoalOrm.id == goal_id)
             result = await session.execute(query)
-            await session.commit()
+            await commit(session, f"user:{user_id}:goals")
             return {"message": "Financial goal deleted successfully", "goal_id": goal_id}
 
     @classmethod
-    async def get_financial_goal_by_id(cls, goal_id: int) -> SFinancialGoal:
-        async with new_session() as session:
+    async def get_financial_goal_by_id(cls, goal_id: int, session: Optional[AsyncSession] = None) -> SFinancialGoal:
+        async with use_session(session) as session:
             query = select(FinancialGoalOrm).where(FinancialGoalOrm.id == goal_id)
             result = await session.execute(query)
             financial_goal_model = result.scalar()
@@ -518,65 +887,74 @@ class FinancialGoalRepository:
                 raise HTTPException(status_code=404, detail="Financial goal not found")
 
     @classmethod
-    async def get_financial_goals(cls) -> list[FinancialGoalOrm]:
-        async with new_session() as session:
-            query = select(FinancialGoalOrm)
+    async def get_financial_goals(cls, limit: int, cursor: Optional[int] = None,
+                                  min_amount: Optional[Decimal] = None,
+                                  max_amount: Optional[Decimal] = None,
+                                  session: Optional[AsyncSession] = None) -> SPage[SFinancialGoal]:
+        async with use_session(session) as session:
+            query = where_between(select_columns(FinancialGoalOrm), FinancialGoalOrm.amount, min_amount, max_amount)
+            query = paginate(query, FinancialGoalOrm, limit, cursor)
             result = await session.execute(query)
-            financial_goals = result.scalars().all()
-            return financial_goals
+            return build_page(result.all(), SFinancialGoal, limit)
 
     @classmethod
-    async def get_financial_goals_by_user_id(cls, user_id: int, is_done: bool) -> list[SFinancialGoal]:
-        async with new_session() as session:
-            query = select(FinancialGoalOrm).where(
+    async def get_financial_goals_by_user_id(cls, user_id: int, is_done: bool,
+                                             session: Optional[AsyncSession] = None) -> list[SFinancialGoal]:
+        async with use_session(session) as session:
+            query = select_columns(FinancialGoalOrm).where(
                 FinancialGoalOrm.user_id == user_id,
                 FinancialGoalOrm.is_done == is_done
             )
             result = await session.execute(query)
-            financial_goals_models = result.scalars().all()
-            financial_goals_schemas = [
-                SFinancialGoal.model_validate(financial_goal_model)
-                for financial_goal_model in financial_goals_models
-            ]
-            return financial_goals_schemas
+            return construct_all(result.all(), SFinancialGoal)
 
+@instrument_repository
 class BudgetRepository:
     @classmethod
-    async def add_budget(cls, data: SBudgetAdd) -> dict:
-        async with new_session() as session:
+    async def add_budget(cls, data: SBudgetAdd, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             budget = BudgetOrm(**data.dict())
             session.add(budget)
             await session.flush()
-            await session.commit()
+            await bump_budgets_revision(session, data.account_id)
+            await commit(session, f"user:{data.user_id}:budgets")
             return budget
 
     @classmethod
-    async def update_budget(cls, budget_id: int, data: SBudgetAdd) -> dict:
-        async with new_session() as session:
+    async def update_budget(cls, budget_id: int, data: SBudgetAdd, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
             query = select(BudgetOrm).where(BudgetOrm.id == budget_id)
             result = await session.execute(query)
             budget = result.scalar()
 
             if not budget:
                 raise HTTPException(status_code=404, detail="Budget not found")
+            old_user_id = budget.user_id
+            await bump_budgets_revision(session, budget.account_id, data.account_id)
 
             for field, value in data.dict().items():
                 setattr(budget, field, value)
 
-            await session.commit()
+            await commit(session, f"user:{old_user_id}:budgets", f"user:{data.user_id}:budgets")
             return budget
 
     @classmethod
-    async def delete_budget(cls, budget_id: int) -> dict:
-        async with new_session() as session:
+    async def delete_budget(cls, budget_id: int, session: Optional[AsyncSession] = None) -> dict:
+        async with use_session(session) as session:
+            budget = (await session.execute(
+                select(BudgetOrm.user_id, BudgetOrm.account_id).where(BudgetOrm.id == budget_id)
+            )).first()
+            user_id = budget.user_id if budget else None
+            if budget:
+                await bump_budgets_revision(session, budget.account_id)
             query = delete(BudgetOrm).where(BudgetOrm.id == budget_id)
             result = await session.execute(query)
-            await session.commit()
+            await commit(session, f"user:{user_id}:budgets")
             return {"message": "Budget deleted successfully", "budget_id": budget_id}
 
     @classmethod
-    async def get_budget_by_id(cls, budget_id: int) -> SBudget:
-        async with new_session() as session:
+    async def get_budget_by_id(cls, budget_id: int, session: Optional[AsyncSession] = None) -> SBudget:
+        async with use_session(session) as session:
             query = select(BudgetOrm).where(BudgetOrm.id == budget_id)
             result = await session.execute(query)
             budget_model = result.scalar()
@@ -587,21 +965,29 @@ class BudgetRepository:
                 raise HTTPException(status_code=404, detail="Budget not found")
 
     @classmethod
-    async def get_budgets(cls) -> list[SBudget]:
-        async with new_session() as session:
-            query = select(BudgetOrm)
+    async def get_budgets(cls, limit: int, cursor: Optional[int] = None,
+                          date_from: Optional[date] = None, date_to: Optional[date] = None,
+                          min_amount: Optional[Decimal] = None, max_amount: Optional[Decimal] = None,
+                          session: Optional[AsyncSession] = None) -> SPage[SBudget]:
+        async with use_session(session) as session:
+            query = where_between(select_columns(BudgetOrm), BudgetOrm.date, date_from, date_to)
+            query = where_between(query, BudgetOrm.amount, min_amount, max_amount)
+            query = paginate(query, BudgetOrm, limit, cursor)
             result = await session.execute(query)
-            budgets_models = result.scalars().all()
-            budget_schemas = [SBudget.model_validate(budget_models) for budget_models in budgets_models]
-            return budget_schemas
+            return build_page(result.all(), SBudget, limit)
 
     @classmethod
-    async def get_budgets_by_user_id(cls, user_id: int) -> list[SBudget]:
-        async with new_session() as session:
-            query = select(BudgetOrm).where(BudgetOrm.user_id == user_id)
+    async def get_budgets_by_ids(cls, ids: list[int], session: Optional[AsyncSession] = None) -> SBatch[SBudget]:
+        async with use_session(session) as session:
+            result = await session.execute(select_columns(BudgetOrm).where(BudgetOrm.id.in_(ids)))
+            return build_batch(result.all(), SBudget, ids)
+
+    @classmethod
+    @cached("user:{user_id}:budgets")
+    async def get_budgets_by_user_id(cls, user_id: int, session: Optional[AsyncSession] = None) -> list[SBudget]:
+        async with use_session(session) as session:
+            query = select_columns(BudgetOrm).where(BudgetOrm.user_id == user_id)
             result = await session.execute(query)
-            budgets_models = result.scalars().all()
-            budget_schemas = [SBudget.model_validate(budget_models) for budget_models in budgets_models]
-            return budget_schemas
+            return construct_all(result.all(), SBudget)
 
 
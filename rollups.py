@@ -0,0 +1,72 @@
+import asyncio
+import sys
+
+from sqlalchemy import select, delete, insert, func
+
+from database import new_session, TransactionOrm, AccountOrm, TransactionRollupOrm
+
+# Пересчет и проверка таблицы transaction_rollups по исходным транзакциям.
+# Запуск: python rollups.py rebuild | check
+
+ROLLUP_COLUMNS = ["user_id", "income", "day", "category_id", "total", "count"]
+
+def raw_rollups_query():
+    return select(
+        AccountOrm.user_id,
+        TransactionOrm.income,
+        TransactionOrm.date,
+        TransactionOrm.category_id,
+        func.sum(TransactionOrm.amount),
+        func.count(),
+    ).select_from(TransactionOrm).join(AccountOrm).group_by(
+        AccountOrm.user_id, TransactionOrm.income, TransactionOrm.date, TransactionOrm.category_id
+    )
+
+def rebuild_statements():
+    return [
+        delete(TransactionRollupOrm),
+        insert(TransactionRollupOrm).from_select(ROLLUP_COLUMNS, raw_rollups_query()),
+    ]
+
+async def rebuild_rollups():
+    async with new_session() as session:
+        for statement in rebuild_statements():
+            await session.execute(statement)
+        await session.commit()
+
+# Сравнение агрегатов: возвращает список расхождений (пустой, если таблица согласована)
+async def check_rollups() -> list[str]:
+    async with new_session() as session:
+        raw = {
+            (user_id, income, day, category_id): (total, count)
+            for user_id, income, day, category_id, total, count in (await session.execute(raw_rollups_query())).all()
+        }
+        stored = {
+            (rollup.user_id, rollup.income, rollup.day, rollup.category_id): (rollup.total, rollup.count)
+            for rollup in (await session.execute(
+                select(TransactionRollupOrm).where(TransactionRollupOrm.count > 0)
+            )).scalars()
+        }
+
+    problems = []
+    for key in sorted(raw.keys() | stored.keys(), key=str):
+        if raw.get(key) != stored.get(key):
+            problems.append(f"{dict(zip(ROLLUP_COLUMNS, key))}: транзакции {raw.get(key)}, rollup {stored.get(key)}")
+    return problems
+
+async def main(command: str) -> int:
+    if command == "rebuild":
+        await rebuild_rollups()
+        print("Таблица transaction_rollups пересчитана")
+        return 0
+    if command == "check":
+        problems = await check_rollups()
+        for problem in problems:
+            print(problem)
+        print("Расхождений нет" if not problems else f"Расхождений: {len(problems)}")
+        return 1 if problems else 0
+    print("Использование: python rollups.py rebuild | check")
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "")))
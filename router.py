@@ -1,42 +1,125 @@
-from fastapi import APIRouter, Depends, Request, Body, HTTPException, Path
+from fastapi import APIRouter, Depends, Request, Response, Body, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse, ORJSONResponse, PlainTextResponse
 from schemas import (SUserAdd, SUser, SAccountAdd, SAccount, STransactionAdd, STransaction, SCategoryAdd, SCategory,
-                     SFinancialGoalAdd, SFinancialGoal, SBudget, SBudgetAdd)
+                     SFinancialGoalAdd, SFinancialGoal, SBudget, SBudgetAdd, SPage, SBatch, SDashboard, Money)
 from repository import (UserRepository, AccountRepository, TransactionRepository, CategoryRepository,
-                        FinancialGoalRepository, BudgetRepository)
-from typing import Annotated, Dict
+                        FinancialGoalRepository, BudgetRepository, BULK_CHUNK_SIZE, BulkImportError,
+                        user_conflict_error,
+                        get_session)
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import read_cache
+from metrics import render_metrics, format_labels
+from config import SMTP_SENDER
+from mailer import email_queue, MailerUnavailable
+from typing import Annotated, AsyncIterator, Dict, Literal, Optional
+from datetime import date
+from decimal import Decimal
+import asyncio
+import csv
+import io
+import json
+import orjson
 import random
 import string
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.utils import formatdate
 
 # Функция генерации случайного кода из 4 цифр
 def generate_verification_code():
     return ''.join(random.choices(string.digits, k=4))
 
-# Функция отправки письма с кодом на почту
-async def send_verification_code(email: str, code: str):
-    smtp_server = 'smtp.yandex.ru'
-    port = 587
-    sender_email = 'walletcontrol@yandex.ru'
-    password = 'muchygfsxratlrny'
-
-    server = smtplib.SMTP(smtp_server, port)
-    server.starttls()
-
-    server.login(sender_email, password)
-
+# Функция отправки письма с кодом на почту: письмо ставится в очередь и отправляется в фоне
+def send_verification_code(email: str, code: str):
     message = MIMEMultipart()
-    message['From'] = sender_email
+    message['From'] = SMTP_SENDER
     message['To'] = email
     message['Subject'] = 'Запрос на восстановление пароля'
 
     body = f'Ваш код подтверждения: {code}'
     message.attach(MIMEText(body, 'plain'))
 
-    server.sendmail(sender_email, email, message.as_string())
+    email_queue.enqueue(email, message)
+
+# Параметры постраничной выдачи списков
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+PageLimit = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+
+# Одна сессия БД на запрос: все вызовы репозитория обработчика идут через одно соединение
+# и фиксируются одним коммитом в конце (см. repository.get_session)
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
 
-    server.quit()
+# Выборка по списку id (?ids=1,2,3) вместо отдельного запроса на каждую запись;
+# при переданном ids параметры пагинации и фильтры не применяются
+BatchIds = Annotated[Optional[str], Query(description="Список id через запятую, не больше " + str(MAX_PAGE_SIZE))]
+
+def parse_ids(ids: str) -> list[int]:
+    try:
+        parsed = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids должен быть списком целых чисел через запятую")
+    if not parsed or len(parsed) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=422, detail=f"ids должен содержать от 1 до {MAX_PAGE_SIZE} значений")
+    return parsed
+
+EXPORT_COLUMNS = ["id", "name", "description", "amount", "date", "income", "account_id", "category_id"]
+
+def export_json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+# Быстрый путь для списков: репозиторий собирает схемы из доверенных строк БД (model_construct),
+# поэтому ответ сериализуется orjson напрямую, без повторной валидации через response_model.
+# response_model в декораторе остается для документации OpenAPI.
+def fast_json_default(value):
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=fast_json_default, option=orjson.OPT_NON_STR_KEYS)
+
+# Заголовки, выставленные зависимостями (например, ETag), переносятся в ответ
+def fast_json(content, response: Optional[Response] = None) -> FastJSONResponse:
+    headers = None
+    if response is not None:
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return FastJSONResponse(content, headers=headers)
+
+# Преобразование пачек строк из БД в NDJSON или CSV по мере чтения
+async def render_transactions_export(batches: AsyncIterator[list[dict]], export_format: str) -> AsyncIterator[str]:
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        yield buffer.getvalue()
+        async for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    else:
+        async for rows in batches:
+            yield "".join(json.dumps(dict(row), default=export_json_default, ensure_ascii=False) + "\n"
+                          for row in rows)
+
+def transactions_export_response(batches: AsyncIterator[list[dict]], export_format: str,
+                                 filename: str) -> StreamingResponse:
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    extension = "csv" if export_format == "csv" else "ndjson"
+    return StreamingResponse(
+        render_transactions_export(batches, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    )
 
 router = APIRouter(
     prefix="/users",
@@ -68,41 +151,86 @@ budgetRouter = APIRouter(
     tags=["Бюджеты"],
 )
 
+cacheRouter = APIRouter(
+    prefix="/cache",
+    tags=["Кэш"],
+)
+
+metricsRouter = APIRouter(
+    tags=["Метрики"],
+)
+
+# Условный GET: ETag и Last-Modified строятся по версии ресурса, которую репозиторий увеличивает
+# при каждой записи. Совпавший If-None-Match получает 304 до обращения к БД и сборки схем.
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Сравнение слабое (RFC 9110): префикс W/ не учитывается
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in tags
+
+async def check_not_modified(request: Request, response: Response, tag: str):
+    version = await read_cache.resource_version(tag)
+    if version is None:
+        return
+    etag, modified = version
+    headers = {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True), "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+async def accounts_not_modified(user_id: int, request: Request, response: Response):
+    await check_not_modified(request, response, f"user:{user_id}:accounts")
+
+async def budgets_not_modified(user_id: int, request: Request, response: Response):
+    await check_not_modified(request, response, f"user:{user_id}:budgets")
+
+async def financial_goals_not_modified(user_id: int, request: Request, response: Response):
+    await check_not_modified(request, response, f"user:{user_id}:goals")
+
+async def categories_not_modified(request: Request, response: Response):
+    await check_not_modified(request, response, "categories")
+
 @router.post("/add")
 async def add_user(
+        session: SessionDep,
         # user: Annotated[SUserAdd, Depends()],
         data: SUserAdd = Body(...)
 ):
-    userEmail = await UserRepository.get_user_by_email(data.email)
-    userLogin = await UserRepository.get_user_by_login(data.login)
-    if userEmail:
-        raise HTTPException(status_code=400, detail="Пользователь с почтой " + userEmail.email + " зарегистрирован")
-    if userLogin:
-        raise HTTPException(status_code=400, detail="Пользователь с логином " + userLogin.login + " зарегистрирован")
+    conflict = await UserRepository.get_registration_conflict(data.email, data.login, session=session)
+    if conflict:
+        raise user_conflict_error(conflict, data)
 
-    user = await UserRepository.add_user(data)
+    user = await UserRepository.add_user(data, session=session)
 
     return user
 
-@router.get("")
-async def get_users() -> list[SUser]:
-    users = await UserRepository.get_users()
-    return users
+@router.get("", response_model=SPage[SUser], response_class=FastJSONResponse)
+async def get_users(session: SessionDep, limit: PageLimit = DEFAULT_PAGE_SIZE, cursor: Optional[int] = None):
+    users = await UserRepository.get_users(limit, cursor, session=session)
+    return fast_json(users)
 
 # Эндпоинт для запроса восстановления пароля
 @router.post("/password/recovery")
-async def request_password_recovery(data: SUserAdd = Body(...)):
+async def request_password_recovery(session: SessionDep, data: SUserAdd = Body(...)):
     # Проверяем, есть ли пользователь с такой почтой в базе данных
-    user = await UserRepository.get_user_by_email(data.email)
+    user = await UserRepository.get_user_by_email(data.email, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь с такой почтой не найден")
 
     # Генерируем код и отправляем его на почту пользователя
     verification_code = generate_verification_code()
     user.code = verification_code
-    await UserRepository.update_verification_code(user.email, user.code)
+    await UserRepository.update_verification_code(user.email, user.code, session=session)
 
-    await send_verification_code(data.email, verification_code)
+    try:
+        send_verification_code(data.email, verification_code)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Сервис отправки писем перегружен, попробуйте позже")
+    except MailerUnavailable:
+        raise HTTPException(status_code=503, detail="Отправка писем не настроена")
 
     # Возвращаем код для последующей проверки
     # return {"verification_code": verification_code}
@@ -116,9 +244,9 @@ async def request_password_recovery(data: SUserAdd = Body(...)):
 
 # Эндпоинт для сброса пароля
 @router.post("/password/reset")
-async def reset_password(data: SUserAdd = Body(...)):
+async def reset_password(session: SessionDep, data: SUserAdd = Body(...)):
     # # Проверяем, есть ли пользователь с такой почтой в базе данных
-    user = await UserRepository.get_user_by_email(data.email)
+    user = await UserRepository.get_user_by_email(data.email, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь с такой почтой не найден")
 
@@ -127,13 +255,13 @@ async def reset_password(data: SUserAdd = Body(...)):
         raise HTTPException(status_code=400, detail="Неверный код верификации")
 
     # Обновляем пароль пользователя
-    await UserRepository.update_password(data.email, data.password)
+    await UserRepository.update_password(data.email, data.password, session=session)
 
     return {"message": "Пароль успешно изменен"}
 
 @router.get("/info/{login}")
-async def get_user_by_login(login: str) -> SUser:
-    user = await UserRepository.get_user_by_login(login)
+async def get_user_by_login(session: SessionDep, login: str) -> SUser:
+    user = await UserRepository.get_user_by_login(login, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь с таким логином не найден")
 
@@ -147,8 +275,8 @@ async def get_user_by_login(login: str) -> SUser:
     }
 
 @router.get("/info/email/{email}")
-async def get_user_by_email(email: str) -> SUser:
-    user = await UserRepository.get_user_by_email(email)
+async def get_user_by_email(session: SessionDep, email: str) -> SUser:
+    user = await UserRepository.get_user_by_email(email, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь с такой почтой не найден")
 
@@ -161,97 +289,205 @@ async def get_user_by_email(email: str) -> SUser:
         "id": user.id
     }
 
-@accountRouter.get("/user/{user_id}")
-async def get_accounts_by_user_id(user_id: int) -> list[SAccount]:
-    accounts = await AccountRepository.get_accounts_by_user_id(user_id)
+# Главный экран одним запросом вместо шести: запросы репозитория независимы
+# и выполняются одновременно, каждый в своей сессии
+@router.get("/{user_id}/dashboard", response_model=SDashboard, response_class=FastJSONResponse)
+async def get_user_dashboard(user_id: int, day: str = "Month"):
+    accounts, total_balance, budgets, financial_goals, income, expense = await asyncio.gather(
+        AccountRepository.get_accounts_by_user_id(user_id),
+        AccountRepository.get_total_balance(user_id),
+        BudgetRepository.get_budgets_by_user_id(user_id),
+        FinancialGoalRepository.get_financial_goals_by_user_id(user_id, False),
+        TransactionRepository.get_transactions_sum_by_category(user_id, day, income=True),
+        TransactionRepository.get_transactions_sum_by_category(user_id, day, income=False),
+    )
+    return fast_json(SDashboard.model_construct(accounts=accounts, total_balance=total_balance, budgets=budgets,
+                                                financial_goals=financial_goals, income_by_category=income,
+                                                expense_by_category=expense))
+
+@accountRouter.get("/user/{user_id}", dependencies=[Depends(accounts_not_modified)],
+                   response_model=list[SAccount], response_class=FastJSONResponse)
+async def get_accounts_by_user_id(session: SessionDep, user_id: int, response: Response):
+    accounts = await AccountRepository.get_accounts_by_user_id(user_id, session=session)
     if not accounts:
         raise HTTPException(status_code=404, detail="Счета для пользователя с данным идентификатором не найдены")
-    return accounts
+    return fast_json(accounts, response)
 @accountRouter.get("/user/detail/{account_id}")
-async def get_account_by_id(account_id: int) -> SAccount:
-    account = await AccountRepository.get_account_by_id(account_id)
+async def get_account_by_id(session: SessionDep, account_id: int) -> SAccount:
+    account = await AccountRepository.get_account_by_id(account_id, session=session)
     if not account:
         raise HTTPException(status_code=404, detail="Счет для пользователя с данным идентификатором не найден")
     return account
 
 @accountRouter.post("/add")
 async def add_account(
+        session: SessionDep,
         data: SAccountAdd = Body(...)
 ):
-    account = await AccountRepository.add_account(data)
+    account = await AccountRepository.add_account(data, session=session)
 
-@accountRouter.get("")
-async def get_accounts() -> list[SAccount]:
-    accounts = await AccountRepository.get_accounts()
-    return accounts
+@accountRouter.get("", response_model=SBatch[SAccount] | SPage[SAccount], response_class=FastJSONResponse)
+async def get_accounts(session: SessionDep, limit: PageLimit = DEFAULT_PAGE_SIZE, cursor: Optional[int] = None,
+                       min_balance: Optional[Money] = None, max_balance: Optional[Money] = None,
+                       ids: BatchIds = None):
+    if ids is not None:
+        return fast_json(await AccountRepository.get_accounts_by_ids(parse_ids(ids), session=session))
+    accounts = await AccountRepository.get_accounts(limit, cursor, min_balance, max_balance, session=session)
+    return fast_json(accounts)
 
 @accountRouter.get("/total_balance/user/{user_id}")
-async def get_total_balance(user_id: int):
-    total_balance = await AccountRepository.get_total_balance(user_id)
+async def get_total_balance(session: SessionDep, user_id: int):
+    total_balance = await AccountRepository.get_total_balance(user_id, session=session)
     return {"total_balance": total_balance}
 
 @accountRouter.delete("/user/delete/{account_id}")
-async def delete_account(account_id: int):
+async def delete_account(session: SessionDep, account_id: int):
     try:
-        result = await AccountRepository.delete_account(account_id)
+        result = await AccountRepository.delete_account(account_id, session=session)
         return result
     except NoResultFound as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @accountRouter.put("/update/{account_id}")
-async def update_account(account_id: int,
+async def update_account(session: SessionDep, account_id: int,
         data: SAccountAdd = Body(...)):
     try:
-        updated_account = await AccountRepository.update_account(account_id, data)
+        updated_account = await AccountRepository.update_account(account_id, data, session=session)
         return {"message": "Account updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to update transaction: {str(e)}")
-
-
-@transactionRouter.get("")
-async def get_transactions() -> list[STransaction]:
-    transactions = await TransactionRepository.get_transactions()
-    return transactions
-
-@transactionRouter.get("/account/{account_id}/income/{income}")
-async def get_transactions_by_account_id_and_income(account_id: int, income: bool):
-    transactions = await TransactionRepository.get_transactions_income(account_id, income)
+        raise HTTPException(status_code=500, detail=f"Failed to update account: {str(e)}")
+
+
+@transactionRouter.get("", response_model=SBatch[STransaction] | SPage[STransaction],
+                       response_class=FastJSONResponse)
+async def get_transactions(session: SessionDep, limit: PageLimit = DEFAULT_PAGE_SIZE, cursor: Optional[int] = None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None,
+                           min_amount: Optional[Money] = None, max_amount: Optional[Money] = None,
+                           ids: BatchIds = None):
+    if ids is not None:
+        return fast_json(await TransactionRepository.get_transactions_by_ids(parse_ids(ids), session=session))
+    transactions = await TransactionRepository.get_transactions(limit, cursor, date_from, date_to,
+                                                                min_amount, max_amount, session=session)
+    return fast_json(transactions)
+
+@transactionRouter.get("/account/{account_id}/income/{income}", response_model=list[STransaction],
+                       response_class=FastJSONResponse)
+async def get_transactions_by_account_id_and_income(session: SessionDep, account_id: int, income: bool):
+    transactions = await TransactionRepository.get_transactions_income(account_id, income, session=session)
     if not transactions:
         raise HTTPException(status_code=404, detail="Транзакции для счета с данным идентификатором не найдены")
-    return transactions
+    return fast_json(transactions)
 
-@transactionRouter.get("/account/{account_id}")
-async def get_transactions_by_account_id(account_id: int) -> list[STransaction]:
-    transactions = await TransactionRepository.get_transactions_by_account_id(account_id)
+@transactionRouter.get("/account/{account_id}", response_model=list[STransaction], response_class=FastJSONResponse)
+async def get_transactions_by_account_id(session: SessionDep, account_id: int):
+    transactions = await TransactionRepository.get_transactions_by_account_id(account_id, session=session)
     if not transactions:
         raise HTTPException(status_code=404, detail="Транзакции для счета с данным идентификатором не найдены")
-    return transactions
+    return fast_json(transactions)
+
+@transactionRouter.get("/export/user/{user_id}")
+async def export_transactions_by_user_id(user_id: int, format: Literal["ndjson", "csv"] = "ndjson"):
+    batches = TransactionRepository.stream_transactions(user_id=user_id)
+    return transactions_export_response(batches, format, f"transactions_user_{user_id}")
+
+@transactionRouter.get("/export/account/{account_id}")
+async def export_transactions_by_account_id(account_id: int, format: Literal["ndjson", "csv"] = "ndjson"):
+    batches = TransactionRepository.stream_transactions(account_id=account_id)
+    return transactions_export_response(batches, format, f"transactions_account_{account_id}")
 
 @transactionRouter.post("/add")
 async def add_transactions(
+        session: SessionDep,
         data: STransactionAdd = Body(...)
 ):
-    transaction = await TransactionRepository.add_transaction(data)
+    transaction = await TransactionRepository.add_transaction(data, session=session)
+
+# Ограничения массового импорта: размер тела запроса (байт) и число строк
+BULK_MAX_BYTES = 16 * 1024 * 1024
+BULK_MAX_ITEMS = 100000
+
+# Тело запроса читается по частям и не дальше BULK_MAX_BYTES, в том числе без Content-Length
+async def read_limited_body(request: Request, limit: int) -> bytes:
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise HTTPException(status_code=413, detail=f"Размер запроса больше {limit} байт")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail=f"Размер запроса больше {limit} байт")
+    return bytes(body)
+
+# Массовый импорт: JSON-массив или NDJSON (application/x-ndjson), ошибки возвращаются по номеру строки.
+# Пачки фиксируются по отдельности: при сбое пачки ответ 500 сообщает, сколько строк уже записано
+# и с какой строки (failed_index) повторить импорт
+@transactionRouter.post("/bulk")
+async def add_transactions_bulk(request: Request,
+                                chunk_size: Annotated[int, Query(ge=1, le=10000)] = BULK_CHUNK_SIZE):
+    body = await read_limited_body(request, BULK_MAX_BYTES)
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный формат данных")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Ожидается список транзакций")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Больше {BULK_MAX_ITEMS} транзакций в запросе")
+
+    rows = []
+    positions = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            rows.append(STransactionAdd.model_validate(item))
+            positions.append(index)
+        except ValidationError as e:
+            errors.append({"index": index, "detail": e.errors(include_url=False)})
+
+    try:
+        result = await TransactionRepository.add_transactions_bulk(rows, chunk_size)
+    except BulkImportError as e:
+        failed_index = positions[e.index]
+        errors = [error for error in errors if error["index"] < failed_index]
+        errors.extend({**error, "index": positions[error["index"]]} for error in e.errors)
+        errors.sort(key=lambda error: error["index"])
+        raise HTTPException(status_code=500, detail={
+            "message": "Импорт прерван ошибкой БД", "inserted": e.inserted, "failed_index": failed_index,
+            "errors": errors
+        })
+    for error in result["errors"]:
+        error["index"] = positions[error["index"]]
+    errors.extend(result["errors"])
+    errors.sort(key=lambda error: error["index"])
+
+    return {"inserted": result["inserted"], "errors": errors}
 
 @transactionRouter.get("/detail/{transaction_id}")
-async def get_transaction_by_id(transaction_id: int) -> STransactionAdd:
-    transaction = await TransactionRepository.get_transaction_by_id(transaction_id)
+async def get_transaction_by_id(session: SessionDep, transaction_id: int) -> STransactionAdd:
+    transaction = await TransactionRepository.get_transaction_by_id(transaction_id, session=session)
     if not transaction:
         raise HTTPException(status_code=404, detail="Транзакция не найдена")
     return STransaction.model_validate(transaction)
 
 @transactionRouter.delete("/delete/{transaction_id}")
-async def delete_transaction(transaction_id: int):
-    await TransactionRepository.delete_transaction_by_id(transaction_id)
+async def delete_transaction(session: SessionDep, transaction_id: int):
+    await TransactionRepository.delete_transaction_by_id(transaction_id, session=session)
     return {"message": "Transaction deleted successfully"}
 
 @transactionRouter.put("/update/{transaction_id}")
-async def update_transaction(transaction_id: int,
+async def update_transaction(session: SessionDep, transaction_id: int,
         data: STransactionAdd = Body(...)
 ):
     try:
-        updated_transaction = await TransactionRepository.update_transaction(transaction_id, data)
+        updated_transaction = await TransactionRepository.update_transaction(transaction_id, data, session=session)
         return {"message": "Transaction updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update transaction: {str(e)}")
 
@@ -263,16 +499,18 @@ async def update_transaction(transaction_id: int,
 #     return transactions
 
 @transactionRouter.get("/user/{user_id}/income/{day}", response_model=Dict[str, float])
-async def get_income_transactions_sum_by_category(user_id: int, day: str):
-    transactions_sum_by_category = await TransactionRepository.get_income_transactions_sum_by_category(user_id, day)
+async def get_income_transactions_sum_by_category(session: SessionDep, user_id: int, day: str):
+    transactions_sum_by_category = await TransactionRepository.get_transactions_sum_by_category(
+        user_id, day, income=True, session=session)
     if not transactions_sum_by_category:
         raise HTTPException(status_code=404,
                             detail="Доходные транзакции для пользователя с данным идентификатором не найдены")
     return transactions_sum_by_category
 
 @transactionRouter.get("/user/{user_id}/expense/{day}", response_model=Dict[str, float])
-async def get_expense_transactions_sum_by_category(user_id: int, day: str) -> list[STransaction]:
-    transactions_sum_by_category = await TransactionRepository.get_expense_transactions_sum_by_category(user_id, day)
+async def get_expense_transactions_sum_by_category(session: SessionDep, user_id: int, day: str) -> list[STransaction]:
+    transactions_sum_by_category = await TransactionRepository.get_transactions_sum_by_category(
+        user_id, day, income=False, session=session)
     if not transactions_sum_by_category:
         raise HTTPException(status_code=404,
                             detail="Расходные транзакции для пользователя с данным идентификатором не найдены")
@@ -282,60 +520,71 @@ async def get_expense_transactions_sum_by_category(user_id: int, day: str) -> li
 
 @categoryRouter.post("/add")
 async def add_category(
+        session: SessionDep,
         data: SCategoryAdd = Body(...)
 ):
-    category = await CategoryRepository.add_category(data)
+    category = await CategoryRepository.add_category(data, session=session)
 
-@categoryRouter.get("")
-async def get_categories() -> list[SCategory]:
-    categories = await CategoryRepository.get_categories()
-    return categories
+@categoryRouter.get("", dependencies=[Depends(categories_not_modified)],
+                    response_model=SPage[SCategory], response_class=FastJSONResponse)
+async def get_categories(session: SessionDep, response: Response, limit: PageLimit = DEFAULT_PAGE_SIZE,
+                         cursor: Optional[int] = None):
+    categories = await CategoryRepository.get_categories(limit, cursor, session=session)
+    return fast_json(categories, response)
 
 @categoryRouter.delete("/delete/{category_id}")
-async def delete_category(category_id: int):
+async def delete_category(session: SessionDep, category_id: int):
     try:
-        result = await CategoryRepository.delete_category(category_id)
+        result = await CategoryRepository.delete_category(category_id, session=session)
         return result
     except NoResultFound as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @financialGoalRouter.post("/add")
 async def add_financial_goal(
+        session: SessionDep,
         data: SFinancialGoalAdd = Body(...)
 ):
-    financial_goal = await FinancialGoalRepository.add_financial_goal(data)
+    financial_goal = await FinancialGoalRepository.add_financial_goal(data, session=session)
 
-@financialGoalRouter.get("")
-async def get_financial_goals() -> list[SFinancialGoal]:
-    financial_goals = await FinancialGoalRepository.get_financial_goals()
-    return financial_goals
+@financialGoalRouter.get("", response_model=SPage[SFinancialGoal], response_class=FastJSONResponse)
+async def get_financial_goals(session: SessionDep, limit: PageLimit = DEFAULT_PAGE_SIZE, cursor: Optional[int] = None,
+                              min_amount: Optional[Money] = None,
+                              max_amount: Optional[Money] = None):
+    financial_goals = await FinancialGoalRepository.get_financial_goals(limit, cursor, min_amount, max_amount,
+                                                                        session=session)
+    return fast_json(financial_goals)
 
 @financialGoalRouter.get("/detail/{goal_id}")
-async def get_financial_goal_by_id(goal_id: int) -> SFinancialGoal:
-    financial_goal = await FinancialGoalRepository.get_financial_goal_by_id(goal_id)
+async def get_financial_goal_by_id(session: SessionDep, goal_id: int) -> SFinancialGoal:
+    financial_goal = await FinancialGoalRepository.get_financial_goal_by_id(goal_id, session=session)
     if not financial_goal:
         raise HTTPException(status_code=404, detail="Финансовая цель не найдена")
     return financial_goal
 
-@financialGoalRouter.get("/{user_id}/{is_done}")
-async def get_financial_goals_by_user_id(user_id: int, is_done: bool) -> list[SFinancialGoal]:
-    financial_goals = await FinancialGoalRepository.get_financial_goals_by_user_id(user_id, is_done)
-    return financial_goals
+@financialGoalRouter.get("/{user_id}/{is_done}", dependencies=[Depends(financial_goals_not_modified)],
+                         response_model=list[SFinancialGoal], response_class=FastJSONResponse)
+async def get_financial_goals_by_user_id(session: SessionDep, user_id: int, is_done: bool, response: Response):
+    financial_goals = await FinancialGoalRepository.get_financial_goals_by_user_id(user_id, is_done, session=session)
+    return fast_json(financial_goals, response)
 
 
 @financialGoalRouter.put("/update/{financial_goal_id}")
-async def update_financial_goal(financial_goal_id: int,
+async def update_financial_goal(session: SessionDep, financial_goal_id: int,
         data: SFinancialGoalAdd = Body(...)):
     try:
-        updated_financial_goal = await FinancialGoalRepository.update_financial_goal(financial_goal_id, data)
+        updated_financial_goal = await FinancialGoalRepository.update_financial_goal(financial_goal_id, data,
+                                                                                     session=session)
         return {"message": "Financial goal updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update financial goal: {str(e)}")
 
 @financialGoalRouter.delete("/delete/{financial_goal_id}")
-async def delete_financial_goal(financial_goal_id: int):
+async def delete_financial_goal(session: SessionDep, financial_goal_id: int):
     try:
-        result = await FinancialGoalRepository.delete_financial_goal(financial_goal_id)
+        result = await FinancialGoalRepository.delete_financial_goal(financial_goal_id, session=session)
         return result
     except NoResultFound as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -343,41 +592,67 @@ async def delete_financial_goal(financial_goal_id: int):
 
 @budgetRouter.post("/add")
 async def add_budget(
+        session: SessionDep,
         data: SBudgetAdd = Body(...)
 ):
-    budget = await BudgetRepository.add_budget(data)
-
-@budgetRouter.get("")
-async def get_budgets() -> list[SBudget]:
-    budgets = await BudgetRepository.get_budgets()
-    return budgets
+    budget = await BudgetRepository.add_budget(data, session=session)
+
+@budgetRouter.get("", response_model=SBatch[SBudget] | SPage[SBudget], response_class=FastJSONResponse)
+async def get_budgets(session: SessionDep, limit: PageLimit = DEFAULT_PAGE_SIZE, cursor: Optional[int] = None,
+                      date_from: Optional[date] = None, date_to: Optional[date] = None,
+                      min_amount: Optional[Money] = None, max_amount: Optional[Money] = None,
+                      ids: BatchIds = None):
+    if ids is not None:
+        return fast_json(await BudgetRepository.get_budgets_by_ids(parse_ids(ids), session=session))
+    budgets = await BudgetRepository.get_budgets(limit, cursor, date_from, date_to, min_amount, max_amount,
+                                                 session=session)
+    return fast_json(budgets)
 
 @budgetRouter.get("/detail/{budget_id}")
-async def get_budget_by_id(budget_id: int) -> SBudget:
-    budget = await BudgetRepository.get_budget_by_id(budget_id)
+async def get_budget_by_id(session: SessionDep, budget_id: int) -> SBudget:
+    budget = await BudgetRepository.get_budget_by_id(budget_id, session=session)
     if not budget:
         raise HTTPException(status_code=404, detail="Бюджет не найден")
     return budget
 
-@budgetRouter.get("/{user_id}")
-async def get_budgets_by_user_id(user_id: int) -> list[SBudget]:
-    budgets = await BudgetRepository.get_budgets_by_user_id(user_id)
-    return budgets
+@budgetRouter.get("/{user_id}", dependencies=[Depends(budgets_not_modified)],
+                  response_model=list[SBudget], response_class=FastJSONResponse)
+async def get_budgets_by_user_id(session: SessionDep, user_id: int, response: Response):
+    budgets = await BudgetRepository.get_budgets_by_user_id(user_id, session=session)
+    return fast_json(budgets, response)
 
 @budgetRouter.put("/update/{budget_id}")
-async def update_budget(budget_id: int,
+async def update_budget(session: SessionDep, budget_id: int,
         data: SBudgetAdd = Body(...)):
     try:
-        updated_budget = await BudgetRepository.update_budget(budget_id, data)
+        updated_budget = await BudgetRepository.update_budget(budget_id, data, session=session)
         return {"message": "Budget updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update budget: {str(e)}")
 
 @budgetRouter.delete("/delete/{budget_id}")
-async def delete_budget(budget_id: int):
+async def delete_budget(session: SessionDep, budget_id: int):
     try:
-        result = await BudgetRepository.delete_budget(budget_id)
+        result = await BudgetRepository.delete_budget(budget_id, session=session)
         return result
     except NoResultFound as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+# Счетчики кэша чтения: попадания, промахи, вытеснения по LRU и сбросы при записи
+@cacheRouter.get("/stats")
+async def get_cache_stats():
+    return read_cache.stats()
+
+# Метрики процесса для Prometheus; счетчики кэша чтения добавляются к метрикам запросов и SQL
+@metricsRouter.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    stats = read_cache.stats()
+    backend = (("backend", stats["backend"]),)
+    cache_lines = []
+    for name in ("hits", "misses", "invalidations", "evictions"):
+        if name in stats:
+            cache_lines += [f"# TYPE read_cache_{name}_total counter",
+                            f"read_cache_{name}_total{format_labels(backend)} {stats[name]}"]
+    return PlainTextResponse(render_metrics(cache_lines), media_type="text/plain; version=0.0.4")
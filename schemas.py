@@ -1,5 +1,24 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, AfterValidator, PlainSerializer
+from typing import Annotated, Generic, Optional, TypeVar
+from decimal import Decimal
+import datetime
+
+from money import to_money
+
+# Денежная сумма: точный Decimal с двумя знаками внутри, число в JSON
+Money = Annotated[Decimal, AfterValidator(to_money), PlainSerializer(float, return_type=float, when_used="json")]
+
+T = TypeVar("T")
+
+# Страница списка с курсором для следующего запроса (id последнего элемента)
+class SPage(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: Optional[int] = None
+
+# Результат выборки по списку id: найденные записи в порядке запроса и id, которых нет в базе
+class SBatch(BaseModel, Generic[T]):
+    items: list[T]
+    missing: list[int]
 
 class SUserAdd(BaseModel):
     name: str
@@ -15,7 +34,7 @@ class SUser(SUserAdd):
 
 class SAccountAdd(BaseModel):
     name: str
-    balance: float
+    balance: Money
     user_id: int
 
 class SAccount(SAccountAdd):
@@ -26,8 +45,8 @@ class SAccount(SAccountAdd):
 class STransactionAdd(BaseModel):
     name: str
     description: str
-    amount: float
-    date: str
+    amount: Money
+    date: datetime.date
     income: bool
     account_id: int
     category_id: int
@@ -48,8 +67,8 @@ class SCategory(SCategoryAdd):
 class SFinancialGoalAdd(BaseModel):
     name: str
     desc: Optional[str]
-    amount: float
-    target_amount: float
+    amount: Money
+    target_amount: Money
     target_date: Optional[str]
     is_done: bool
     user_id: int
@@ -61,14 +80,23 @@ class SFinancialGoal(SFinancialGoalAdd):
 
 class SBudgetAdd(BaseModel):
     name: str
-    amount: float
-    wasted: float
-    date: str
-    target_date: str
+    amount: Money
+    wasted: Money
+    date: datetime.date
+    target_date: datetime.date
     user_id: int
     account_id: int
 
 class SBudget(SBudgetAdd):
     id: int
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+# Данные главного экрана приложения одним ответом
+class SDashboard(BaseModel):
+    accounts: list[SAccount]
+    total_balance: Money
+    budgets: list[SBudget]
+    financial_goals: list[SFinancialGoal]
+    income_by_category: dict[str, Money]
+    expense_by_category: dict[str, Money]
@@ -0,0 +1,76 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+from sqlalchemy import text, make_url
+
+import database
+from budget_index import budget_index
+from cache import read_cache
+from database import create_engine_from_url, new_session, apply_sqlite_pragmas
+from main import app
+from migrations import migrate
+
+# Тесты выполняются на каждом бэкенде БД: SQLite во временном файле и PostgreSQL по адресу из
+# TEST_POSTGRES_URL (база очищается перед каждым тестом). Если PostgreSQL недоступен, его тесты пропускаются;
+# TEST_BACKENDS=sqlite ограничивает прогон одним бэкендом.
+# Запуск: python -m pytest [-k sqlite]
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL", "postgresql+asyncpg://postgres@localhost:5432/finance_test")
+TEST_BACKENDS = os.getenv("TEST_BACKENDS", "sqlite,postgresql").split(",")
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+async def postgres_error(url: str):
+    engine = create_engine_from_url(url)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        return e
+    finally:
+        await engine.dispose()
+    return None
+
+@pytest.fixture(scope="session")
+def postgres_url():
+    try:
+        error = asyncio.run(asyncio.wait_for(postgres_error(TEST_POSTGRES_URL), 5))
+    except asyncio.TimeoutError as e:
+        error = e
+    if error is not None:
+        pytest.skip(f"PostgreSQL недоступен ({make_url(TEST_POSTGRES_URL).render_as_string()}): {error!r}")
+    return TEST_POSTGRES_URL
+
+@pytest.fixture(params=TEST_BACKENDS)
+def database_url(request, tmp_path):
+    if request.param == "sqlite":
+        return f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+    return request.getfixturevalue("postgres_url")
+
+# Пустая база с актуальной схемой; репозитории и приложение работают с ней через new_session.
+# SQLite проверяет внешние ключи, как PostgreSQL: иначе нарушения молча оставляют висячие строки
+@pytest.fixture
+async def engine(database_url):
+    engine = create_engine_from_url(database_url)
+    if engine.dialect.name == "sqlite":
+        apply_sqlite_pragmas(engine, {"foreign_keys": "ON"})
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP SCHEMA public CASCADE"))
+            await conn.execute(text("CREATE SCHEMA public"))
+    await migrate(engine)
+    new_session.configure(bind=engine)
+    await read_cache.clear()
+    budget_index.clear()
+    yield engine
+    new_session.configure(bind=database.engine)
+    budget_index.clear()
+    await engine.dispose()
+
+@pytest.fixture
+async def client(engine):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,158 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, text, inspect
+
+from database import new_session, AccountOrm, BudgetOrm, TransactionOrm, TransactionRollupOrm
+from migrations import convert_money_to_cents
+from repository import (UserRepository, AccountRepository, CategoryRepository, BudgetRepository,
+                        TransactionRepository)
+from rollups import check_rollups
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd, SBudgetAdd, STransactionAdd
+
+# Пути, которые различаются между SQLite и PostgreSQL: RETURNING и его запасной вариант,
+# INSERT ... ON CONFLICT в transaction_rollups, миграция денежных колонок и разбор IntegrityError
+
+pytestmark = pytest.mark.anyio
+
+TODAY = date.today()
+
+def user_data(login: str, email: str) -> SUserAdd:
+    return SUserAdd(name=login, login=login, email=email, password="secret", code="0000")
+
+def transaction_data(amount, income: bool = False, day: date = TODAY, account_id: int = 1,
+                     category_id: int = 1) -> STransactionAdd:
+    return STransactionAdd(name="test", description="", amount=amount, date=day, income=income,
+                           account_id=account_id, category_id=category_id)
+
+async def seed_account(balance=1000) -> int:
+    await UserRepository.add_user(user_data("owner", "owner@example.com"))
+    account = await AccountRepository.add_account(SAccountAdd(name="card", balance=balance, user_id=1))
+    await CategoryRepository.add_category(SCategoryAdd(name="food"))
+    await CategoryRepository.add_category(SCategoryAdd(name="salary"))
+    return account.id
+
+async def account_state(account_id: int) -> tuple[Decimal, list[Decimal]]:
+    async with new_session() as session:
+        balance = (await session.execute(select(AccountOrm.balance).where(AccountOrm.id == account_id))).scalar()
+        wasted = (await session.execute(
+            select(BudgetOrm.wasted).where(BudgetOrm.account_id == account_id).order_by(BudgetOrm.id)
+        )).scalars().all()
+    return balance, wasted
+
+@pytest.fixture(params=["returning", "no_returning"])
+def returning(request, engine, monkeypatch):
+    # Без RETURNING репозиторий читает затронутые строки отдельным SELECT
+    if request.param == "no_returning":
+        monkeypatch.setattr(engine.dialect, "update_returning", False)
+        monkeypatch.setattr(engine.dialect, "delete_returning", False)
+    elif not (engine.dialect.update_returning and engine.dialect.delete_returning):
+        pytest.skip("СУБД не поддерживает RETURNING")
+    return request.param
+
+async def test_add_user_reports_duplicate_field(engine):
+    await UserRepository.add_user(user_data("alice", "alice@example.com"))
+
+    # Проверка дубликатов выполняется уникальными индексами: поле определяется по тексту IntegrityError
+    with pytest.raises(HTTPException) as error:
+        await UserRepository.add_user(user_data("alice2", "alice@example.com"))
+    assert error.value.status_code == 400
+    assert "почтой" in error.value.detail
+
+    with pytest.raises(HTTPException) as error:
+        await UserRepository.add_user(user_data("alice", "alice2@example.com"))
+    assert error.value.status_code == 400
+    assert "логином" in error.value.detail
+
+async def test_register_duplicate_over_api(client):
+    body = user_data("bob", "bob@example.com").model_dump()
+    assert (await client.post("/users/add", json=body)).status_code == 200
+    response = await client.post("/users/add", json={**body, "email": "bob2@example.com"})
+    assert response.status_code == 400
+    assert "логином" in response.json()["detail"]
+
+async def test_transaction_writes_keep_balance_budgets_and_rollups(engine, returning):
+    account_id = await seed_account(balance=1000)
+    await BudgetRepository.add_budget(SBudgetAdd(name="month", amount=500, wasted=0, date=TODAY - timedelta(days=5),
+                                                 target_date=TODAY + timedelta(days=5), user_id=1,
+                                                 account_id=account_id))
+
+    transaction = await TransactionRepository.add_transaction(transaction_data("100.10", account_id=account_id))
+    assert await account_state(account_id) == (Decimal("899.90"), [Decimal("100.10")])
+
+    # Расход становится доходом другой категории вне окна бюджета
+    await TransactionRepository.update_transaction(
+        transaction.id, transaction_data("50", income=True, day=TODAY - timedelta(days=30), account_id=account_id,
+                                         category_id=2)
+    )
+    assert await account_state(account_id) == (Decimal("1050.00"), [Decimal("0.00")])
+    assert await check_rollups() == []
+
+    await TransactionRepository.delete_transaction_by_id(transaction.id)
+    assert await account_state(account_id) == (Decimal("1000.00"), [Decimal("0.00")])
+    assert await check_rollups() == []
+
+    with pytest.raises(HTTPException) as error:
+        await TransactionRepository.delete_transaction_by_id(transaction.id)
+    assert error.value.status_code == 404
+
+async def test_missing_account_rolls_back_transaction(engine, returning):
+    await seed_account()
+
+    with pytest.raises(HTTPException) as error:
+        await TransactionRepository.add_transaction(transaction_data(10, account_id=999))
+    assert error.value.status_code == 404
+    async with new_session() as session:
+        assert (await session.execute(select(TransactionOrm))).first() is None
+
+async def test_rollup_upsert_merges_same_group(engine):
+    account_id = await seed_account()
+    for amount in ("10.25", "20.50", "0.25"):
+        await TransactionRepository.add_transaction(transaction_data(amount, account_id=account_id))
+
+    async with new_session() as session:
+        rollups = (await session.execute(select(TransactionRollupOrm))).scalars().all()
+    assert [(rollup.total, rollup.count) for rollup in rollups] == [(Decimal("31.00"), 3)]
+    assert await TransactionRepository.get_transactions_sum_by_category(1, "Month", income=False) == {
+        "food": Decimal("31.00")
+    }
+
+async def test_money_to_cents_migration(engine):
+    await seed_account()
+    # Схема до перехода на копейки: суммы в рублях с плавающей точкой
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            await conn.execute(text("ALTER TABLE accounts ALTER COLUMN balance TYPE DOUBLE PRECISION"))
+            await conn.execute(text("ALTER TABLE transactions ALTER COLUMN amount TYPE DOUBLE PRECISION"))
+        await conn.execute(text("UPDATE accounts SET balance = 1234.56"))
+        await conn.execute(text(
+            "INSERT INTO transactions (name, description, amount, date, income, account_id, category_id) "
+            "VALUES ('legacy', '', 0.1 + 0.2, :day, false, 1, 1)"
+        ), {"day": TODAY})
+
+    async with engine.begin() as conn:
+        await conn.run_sync(convert_money_to_cents)
+
+    async with engine.connect() as conn:
+        columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns("accounts"))
+        assert str(next(column["type"] for column in columns if column["name"] == "balance")) in ("BIGINT", "INTEGER")
+    async with new_session() as session:
+        assert (await session.execute(select(AccountOrm.balance))).scalar() == Decimal("1234.56")
+        assert (await session.execute(select(TransactionOrm.amount))).scalar() == Decimal("0.30")
+
+async def test_delete_account_removes_dependents(client):
+    account_id = await seed_account()
+    await BudgetRepository.add_budget(SBudgetAdd(name="month", amount=500, wasted=0, date=TODAY, target_date=TODAY,
+                                                 user_id=1, account_id=account_id))
+    await TransactionRepository.add_transaction(transaction_data(10, account_id=account_id))
+
+    response = await client.delete(f"/accounts/user/delete/{account_id}")
+    assert response.status_code == 200
+    async with new_session() as session:
+        assert (await session.execute(select(TransactionOrm))).first() is None
+        assert (await session.execute(select(BudgetOrm))).first() is None
+    assert await check_rollups() == []
+
+    assert (await client.delete(f"/accounts/user/delete/{account_id}")).status_code == 404
@@ -0,0 +1,66 @@
+import pickle
+from decimal import Decimal
+
+import pytest
+
+from benchmarks.cache_coherence import check, redis_clients
+from cache import ReadCache, MemoryCacheBackend, RedisCacheBackend, read_cache
+from repository import UserRepository, AccountRepository, CategoryRepository, BudgetRepository
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd
+
+# Согласованность кэша между воркерами: два ReadCache со своими клиентами одного хранилища
+
+pytestmark = pytest.mark.anyio
+
+async def test_memory_backend_is_per_process():
+    assert not await check(ReadCache(MemoryCacheBackend(), enabled=True), ReadCache(MemoryCacheBackend(), enabled=True))
+
+async def test_redis_backend_invalidates_all_workers():
+    backend_a, backend_b = redis_clients(None)
+    assert await check(ReadCache(backend_a, enabled=True), ReadCache(backend_b, enabled=True))
+    await backend_a.close()
+    await backend_b.close()
+
+def fake_redis_backend() -> RedisCacheBackend:
+    import fakeredis
+    return RedisCacheBackend(client=fakeredis.FakeAsyncRedis(), prefix="test:")
+
+# Значение, которое при распаковке pickle выполнило бы код
+class Exploit:
+    executed = False
+
+    def __reduce__(self):
+        return setattr, (Exploit, "executed", True)
+
+async def test_redis_backend_does_not_unpickle_values():
+    backend = fake_redis_backend()
+    await backend.client.set("test:key", pickle.dumps(Exploit()))
+
+    assert await backend.get("key") == (False, None)
+    assert not Exploit.executed
+    await backend.close()
+
+async def test_redis_backend_round_trips_repository_results(client, monkeypatch):
+    monkeypatch.setattr(read_cache, "backend", fake_redis_backend())
+    monkeypatch.setattr(read_cache, "enabled", True)
+    await UserRepository.add_user(SUserAdd(name="owner", login="owner", email="owner@example.com",
+                                           password="secret", code="0000"))
+    await AccountRepository.add_account(SAccountAdd(name="card", balance=Decimal("10.10"), user_id=1))
+    await CategoryRepository.add_category(SCategoryAdd(name="food"))
+
+    calls = [
+        lambda: UserRepository.get_user_by_login("owner"),
+        lambda: UserRepository.get_user_by_login("nobody"),
+        lambda: AccountRepository.get_accounts_by_user_id(1),
+        lambda: AccountRepository.get_total_balance(1),
+        lambda: AccountRepository.get_account_by_id(1),
+        lambda: CategoryRepository.get_categories(10),
+        lambda: BudgetRepository.get_budgets_by_user_id(1),
+    ]
+    for call in calls:
+        hits = read_cache.hits
+        value = await call()
+        assert await call() == value
+        assert read_cache.hits == hits + 1
+    assert await AccountRepository.get_total_balance(1) == Decimal("10.10")
+    await read_cache.close()
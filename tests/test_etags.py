@@ -0,0 +1,35 @@
+import fakeredis
+import pytest
+
+from cache import ReadCache, RedisCacheBackend, read_cache
+
+# Условные GET: ETag выдаются только по версиям из общего хранилища, которое видят все воркеры
+
+pytestmark = pytest.mark.anyio
+
+async def test_no_etags_with_process_local_versions(client):
+    if read_cache.etags:
+        pytest.skip("ETag включены окружением (CACHE_BACKEND=redis или ETAGS_ENABLED)")
+    await client.post("/categories/add", json={"name": "food"})
+
+    response = await client.get("/categories", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+
+async def test_etag_changes_after_write_in_another_worker(client, monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(read_cache, "backend", RedisCacheBackend(client=fakeredis.FakeAsyncRedis(server=server)))
+    monkeypatch.setattr(read_cache, "etags", True)
+    other_worker = ReadCache(RedisCacheBackend(client=fakeredis.FakeAsyncRedis(server=server)), etags=True)
+    await client.post("/categories/add", json={"name": "food"})
+
+    response = await client.get("/categories")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert (await client.get("/categories", headers={"If-None-Match": etag})).status_code == 304
+
+    await other_worker.invalidate("categories")
+    response = await client.get("/categories", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    await other_worker.close()
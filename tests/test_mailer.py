@@ -0,0 +1,170 @@
+import asyncio
+import socket
+import time
+from email import message_from_string
+from email.message import EmailMessage
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from mailer import EmailQueue, MailerUnavailable, email_queue
+
+# Очередь писем против локального SMTP-сервера (aiosmtpd) в отдельном потоке
+
+pytestmark = pytest.mark.anyio
+
+class Handler:
+    def __init__(self):
+        self.messages = []
+        # Сколько следующих писем отклонить временной ошибкой 451
+        self.reject = 0
+        self.attempts = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.attempts += 1
+        if self.reject:
+            self.reject -= 1
+            return "451 Try again later"
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode()))
+        return "250 OK"
+
+# Сервер считает соединения: очередь должна отправлять письма через одно
+class CountingController(Controller):
+    connections = 0
+
+    def factory(self):
+        self.connections += 1
+        return super().factory()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    controller = CountingController(Handler(), hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller
+    controller.stop()
+
+@pytest.fixture
+async def queue(smtp_server):
+    queue = EmailQueue(host=smtp_server.hostname, port=smtp_server.port, user="", starttls=False, timeout=5,
+                       maxsize=10, max_retries=2, retry_backoff=0.05)
+    await queue.start()
+    yield queue
+    await queue.stop()
+
+def message(text: str) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = text
+    message.set_content(text)
+    return message
+
+async def delivered(queue: EmailQueue):
+    await asyncio.wait_for(queue.queue.join(), 10)
+
+async def test_messages_share_one_connection(queue, smtp_server):
+    # Controller.start() сам проверяет готовность сервера пробным соединением
+    connections = smtp_server.connections
+    for number in range(3):
+        queue.enqueue(f"user{number}@example.com", message(f"code {number}"))
+    await delivered(queue)
+
+    assert [rcpt_tos for rcpt_tos, _ in smtp_server.handler.messages] == [
+        ["user0@example.com"], ["user1@example.com"], ["user2@example.com"]
+    ]
+    assert smtp_server.connections == connections + 1
+
+async def test_temporary_failure_is_retried_with_backoff(queue, smtp_server):
+    smtp_server.handler.reject = 2
+    started = time.monotonic()
+    queue.enqueue("user@example.com", message("code"))
+    await delivered(queue)
+
+    assert smtp_server.handler.attempts == 3
+    assert len(smtp_server.handler.messages) == 1
+    # Задержки 0.05 и 0.1 с
+    assert time.monotonic() - started >= 0.15
+
+async def test_message_is_dropped_after_retries(queue, smtp_server, caplog):
+    smtp_server.handler.reject = 3
+    queue.enqueue("lost@example.com", message("lost"))
+    queue.enqueue("user@example.com", message("code"))
+    await delivered(queue)
+
+    assert smtp_server.handler.attempts == 4
+    assert [rcpt_tos for rcpt_tos, _ in smtp_server.handler.messages] == [["user@example.com"]]
+    assert "lost@example.com не отправлено" in caplog.text
+
+async def test_worker_survives_unexpected_error(queue, smtp_server, caplog):
+    class BrokenMessage:
+        def as_string(self):
+            raise RuntimeError("broken message")
+
+    queue.enqueue("broken@example.com", BrokenMessage())
+    queue.enqueue("user@example.com", message("code"))
+    await delivered(queue)
+
+    assert [rcpt_tos for rcpt_tos, _ in smtp_server.handler.messages] == [["user@example.com"]]
+    assert "broken message" in caplog.text
+
+async def test_queue_without_password_is_disabled(caplog):
+    queue = EmailQueue(user="owner@example.com", password="")
+    await queue.start()
+    assert queue.queue is None
+    assert "SMTP_PASSWORD" in caplog.text
+
+    with pytest.raises(MailerUnavailable):
+        queue.enqueue("user@example.com", message("code"))
+    await queue.stop()
+
+async def register(client, email: str):
+    await client.post("/users/add", json={"name": "owner", "login": "owner", "email": email, "password": "secret",
+                                          "code": "0000"})
+
+async def test_password_recovery_sends_code(client, smtp_server, monkeypatch):
+    monkeypatch.setattr(email_queue, "host", smtp_server.hostname)
+    monkeypatch.setattr(email_queue, "port", smtp_server.port)
+    monkeypatch.setattr(email_queue, "user", "")
+    monkeypatch.setattr(email_queue, "starttls", False)
+    await register(client, "owner@example.com")
+
+    await email_queue.start()
+    try:
+        response = await client.post("/users/password/recovery", json={
+            "name": "owner", "login": "owner", "email": "owner@example.com", "password": "", "code": ""
+        })
+        assert response.status_code == 200
+        await delivered(email_queue)
+    finally:
+        await email_queue.stop()
+
+    [(rcpt_tos, content)] = smtp_server.handler.messages
+    assert rcpt_tos == ["owner@example.com"]
+    [body] = message_from_string(content).get_payload()
+    assert response.json()["code"] in body.get_payload(decode=True).decode()
+
+async def test_password_recovery_queue_full_is_503(client, monkeypatch):
+    await register(client, "owner@example.com")
+    full_queue = asyncio.Queue(maxsize=1)
+    full_queue.put_nowait(("other@example.com", message("code")))
+    monkeypatch.setattr(email_queue, "queue", full_queue)
+
+    response = await client.post("/users/password/recovery", json={
+        "name": "owner", "login": "owner", "email": "owner@example.com", "password": "", "code": ""
+    })
+    assert response.status_code == 503
+
+async def test_password_recovery_without_smtp_password_is_503(client, monkeypatch):
+    monkeypatch.setattr(email_queue, "user", "owner@example.com")
+    monkeypatch.setattr(email_queue, "password", "")
+    await register(client, "owner@example.com")
+
+    await email_queue.start()
+    response = await client.post("/users/password/recovery", json={
+        "name": "owner", "login": "owner", "email": "owner@example.com", "password": "", "code": ""
+    })
+    assert response.status_code == 503
+    assert email_queue.queue is None
@@ -0,0 +1,122 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import inspect, select, text
+
+import database
+from database import create_engine_from_url, AccountOrm, TransactionOrm
+from migrations import MIGRATIONS, migrate
+from money import MAX_MONEY
+from repository import AccountRepository, TransactionRepository
+from schemas import SAccountAdd, STransactionAdd
+
+# Одноразовые шаги миграций: в новой базе только отмечаются, в старой выполняются ровно один раз
+
+pytestmark = pytest.mark.anyio
+
+async def applied_migrations(engine) -> set[str]:
+    async with engine.connect() as conn:
+        return set((await conn.execute(text("SELECT name FROM schema_migrations"))).scalars())
+
+async def test_fresh_database_marks_all_migrations(engine):
+    assert await applied_migrations(engine) == {name for name, _ in MIGRATIONS}
+    await migrate(engine)
+    assert await applied_migrations(engine) == {name for name, _ in MIGRATIONS}
+
+async def test_legacy_dates_are_normalized_once(engine):
+    if engine.dialect.name != "sqlite":
+        pytest.skip("Даты строками хранились только в SQLite")
+
+    async with engine.begin() as conn:
+        await conn.execute(text("INSERT INTO users (name, login, email, password, code) VALUES ('a', 'a', 'a', 'a', 'a')"))
+        await conn.execute(text("INSERT INTO accounts (name, balance, user_id) VALUES ('card', 0, 1)"))
+        await conn.execute(text("INSERT INTO categories (name) VALUES ('food')"))
+        await conn.execute(text(
+            "INSERT INTO transactions (name, description, amount, date, income, account_id, category_id) "
+            "VALUES ('legacy', '', 100, '15.01.2024', 0, 1, 1)"
+        ))
+        await conn.execute(text("DELETE FROM schema_migrations WHERE name = '0000_normalize_dates'"))
+
+    await migrate(engine)
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("SELECT date FROM transactions"))).scalar() == "2024-01-15"
+
+    # Повторный запуск не перечитывает таблицы
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE transactions SET date = '16.01.2024'"))
+    await migrate(engine)
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("SELECT date FROM transactions"))).scalar() == "16.01.2024"
+    assert "0000_normalize_dates" in await applied_migrations(engine)
+
+async def test_duplicate_users_are_reported_before_unique_indexes(engine):
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX ix_users_email"))
+        await conn.execute(text("DROP INDEX ix_users_login"))
+        await conn.execute(text(
+            "INSERT INTO users (name, login, email, password, code) VALUES "
+            "('a', 'first', 'same@example.com', 'a', 'a'), ('b', 'second', 'same@example.com', 'b', 'b'), "
+            "('c', 'third', 'other@example.com', 'c', 'c')"
+        ))
+
+    with pytest.raises(RuntimeError) as error:
+        await migrate(engine)
+    assert "email 'same@example.com': id [1, 2]" in str(error.value)
+    assert "login" not in str(error.value).split("\n", 1)[1]
+
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE users SET email = 'second@example.com' WHERE id = 2"))
+    await migrate(engine)
+    async with engine.connect() as conn:
+        indexes = await conn.run_sync(lambda conn: inspect(conn).get_indexes("users"))
+    assert {index["name"] for index in indexes if index["unique"]} == {"ix_users_email", "ix_users_login"}
+
+# Схема до перехода на копейки: денежные колонки объявлены FLOAT
+LEGACY_SQLITE_SCHEMA = (
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR, login VARCHAR, email VARCHAR, password VARCHAR, "
+    "code VARCHAR)",
+    "CREATE TABLE accounts (id INTEGER PRIMARY KEY, name VARCHAR, balance FLOAT, "
+    "user_id INTEGER REFERENCES users (id))",
+    "CREATE TABLE categories (id INTEGER PRIMARY KEY, name VARCHAR)",
+    "CREATE TABLE transactions (id INTEGER PRIMARY KEY, name VARCHAR, description VARCHAR, amount FLOAT, date DATE, "
+    "income BOOLEAN, account_id INTEGER REFERENCES accounts (id), category_id INTEGER REFERENCES categories (id))",
+    "CREATE TABLE budgets (id INTEGER PRIMARY KEY, name VARCHAR, amount FLOAT, wasted FLOAT, date DATE, "
+    "target_date DATE, user_id INTEGER REFERENCES users (id), account_id INTEGER REFERENCES accounts (id))",
+    "CREATE TABLE financial_goals (id INTEGER PRIMARY KEY, name VARCHAR, \"desc\" VARCHAR, amount FLOAT, "
+    "target_amount FLOAT, target_date VARCHAR, is_done BOOLEAN, user_id INTEGER REFERENCES users (id))",
+)
+
+async def test_legacy_sqlite_money_round_trips_at_bound(tmp_path):
+    engine = create_engine_from_url(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+    async with engine.begin() as conn:
+        for statement in LEGACY_SQLITE_SCHEMA:
+            await conn.execute(text(statement))
+        await conn.execute(text("INSERT INTO users (name, login, email, password, code) VALUES ('a', 'a', 'a', 'a', 'a')"))
+        await conn.execute(text("INSERT INTO accounts (name, balance, user_id) VALUES ('card', 1234.56, 1)"))
+        await conn.execute(text("INSERT INTO categories (name) VALUES ('food')"))
+        await conn.execute(text(
+            "INSERT INTO transactions (name, description, amount, date, income, account_id, category_id) "
+            "VALUES ('legacy', '', 0.1 + 0.2, '15.01.2024', 0, 1, 1)"
+        ))
+
+    await migrate(engine)
+    database.new_session.configure(bind=engine)
+    try:
+        account = await AccountRepository.add_account(SAccountAdd(name="deposit", balance=0, user_id=1))
+        await TransactionRepository.add_transaction(STransactionAdd(
+            name="deposit", description="", amount=MAX_MONEY, date="2024-01-16", income=True, account_id=account.id,
+            category_id=1
+        ))
+        async with database.new_session() as session:
+            balances = (await session.execute(select(AccountOrm.balance).order_by(AccountOrm.id))).scalars().all()
+            amounts = (await session.execute(select(TransactionOrm.amount).order_by(TransactionOrm.id))).scalars().all()
+        assert balances == [Decimal("1234.56"), MAX_MONEY]
+        assert amounts == [Decimal("0.30"), MAX_MONEY]
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("SELECT typeof(balance) FROM accounts"))).scalars().all() == [
+                "integer", "integer"
+            ]
+            assert (await conn.execute(text("PRAGMA foreign_key_check"))).all() == []
+    finally:
+        database.new_session.configure(bind=database.engine)
+        await engine.dispose()
@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+import pytest
+
+from money import MAX_MONEY, to_money, to_cents, from_cents
+from repository import AccountRepository
+
+# Денежные суммы: округление до копеек и отказ для значений, которые не помещаются в BIGINT копеек
+
+@pytest.mark.parametrize("value, expected", [
+    (12.5, Decimal("12.50")),
+    ("0.005", Decimal("0.01")),
+    (0.1 + 0.2, Decimal("0.30")),
+    (-3, Decimal("-3.00")),
+    (MAX_MONEY, MAX_MONEY),
+])
+def test_to_money_rounds_to_cents(value, expected):
+    assert to_money(value) == expected
+    assert from_cents(to_cents(value)) == expected
+
+@pytest.mark.parametrize("value", [1e27, 1e17, "1000000000000000", -MAX_MONEY - 1, "NaN", float("inf"), "abc"])
+def test_to_money_rejects_invalid_amounts(value):
+    with pytest.raises(ValueError):
+        to_money(value)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("amount", [1e27, 1e17, "NaN", "Infinity", "1e400"])
+async def test_api_rejects_huge_amounts(client, amount):
+    body = {"name": "card", "balance": amount, "user_id": 1}
+    response = await client.post("/accounts/add", json=body)
+    assert response.status_code == 422
+
+@pytest.mark.anyio
+async def test_bulk_import_reports_bad_amounts_per_row(client):
+    await client.post("/users/add", json={"name": "owner", "login": "owner", "email": "owner@example.com",
+                                          "password": "secret", "code": "0000"})
+    await client.post("/accounts/add", json={"name": "card", "balance": 0, "user_id": 1})
+    await client.post("/categories/add", json={"name": "food"})
+    row = {"name": "test", "description": "", "date": "2024-01-15", "income": False, "account_id": 1,
+           "category_id": 1}
+
+    response = await client.post("/transactions/bulk", json=[
+        {**row, "amount": 1e27}, {**row, "amount": 10}, {**row, "amount": 1e17}
+    ])
+    assert response.status_code == 200
+    result = response.json()
+    assert result["inserted"] == 1
+    assert [error["index"] for error in result["errors"]] == [0, 2]
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("url", [
+    "/transactions?min_amount=1e30",
+    "/transactions?max_amount=inf",
+    "/accounts?max_balance=nan",
+    "/accounts?min_balance=abc",
+    "/budgets?min_amount=1e16",
+    "/financial-goals?max_amount=-1e20",
+])
+async def test_money_filters_reject_invalid_amounts(client, url):
+    assert (await client.get(url)).status_code == 422
+
+@pytest.mark.anyio
+async def test_money_filters_compare_exact_amounts(client):
+    await client.post("/users/add", json={"name": "owner", "login": "owner", "email": "owner@example.com",
+                                          "password": "secret", "code": "0000"})
+    for balance in ("10.10", "10.20", "10.30"):
+        await client.post("/accounts/add", json={"name": "card", "balance": balance, "user_id": 1})
+
+    response = await client.get("/accounts?min_balance=10.2&max_balance=10.30")
+    assert response.status_code == 200
+    assert [account["balance"] for account in response.json()["items"]] == [10.2, 10.3]
+
+@pytest.mark.anyio
+async def test_max_amount_round_trips_exactly(client):
+    await client.post("/users/add", json={"name": "owner", "login": "owner", "email": "owner@example.com",
+                                          "password": "secret", "code": "0000"})
+    await client.post("/accounts/add", json={"name": "deposit", "balance": str(MAX_MONEY), "user_id": 1})
+
+    [account] = await AccountRepository.get_accounts_by_user_id(1)
+    assert account.balance == MAX_MONEY
@@ -0,0 +1,95 @@
+import orjson
+import pytest
+from fastapi import HTTPException
+
+import repository
+import router
+from repository import TransactionRepository
+
+# Ответы эндпоинтов изменения: ошибки репозитория сохраняют свой статус, непредвиденные дают 500
+
+pytestmark = pytest.mark.anyio
+
+ACCOUNT = {"name": "card", "balance": 100, "user_id": 1}
+TRANSACTION = {"name": "test", "description": "", "amount": 10, "date": "2024-01-15", "income": False,
+               "account_id": 1, "category_id": 1}
+FINANCIAL_GOAL = {"name": "car", "desc": None, "amount": 0, "target_amount": 1000, "target_date": None,
+                  "is_done": False, "user_id": 1}
+BUDGET = {"name": "month", "amount": 500, "wasted": 0, "date": "2024-01-01", "target_date": "2024-01-31",
+          "user_id": 1, "account_id": 1}
+
+@pytest.mark.parametrize("url, body", [
+    ("/accounts/update/999", ACCOUNT),
+    ("/transactions/update/999", TRANSACTION),
+    ("/financial-goals/update/999", FINANCIAL_GOAL),
+    ("/budgets/update/999", BUDGET),
+])
+async def test_update_missing_record_is_404(client, url, body):
+    response = await client.put(url, json=body)
+    assert response.status_code == 404
+
+@pytest.mark.parametrize("error, status", [
+    (HTTPException(status_code=409, detail="Transaction was modified concurrently"), 409),
+    (RuntimeError("boom"), 500),
+])
+async def test_update_transaction_error_status(client, monkeypatch, error, status):
+    async def update_transaction(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(TransactionRepository, "update_transaction", update_transaction)
+    response = await client.put("/transactions/update/1", json=TRANSACTION)
+    assert response.status_code == status
+
+async def create_account(client):
+    await client.post("/users/add", json={"name": "owner", "login": "owner", "email": "owner@example.com",
+                                          "password": "secret", "code": "0000"})
+    await client.post("/accounts/add", json=ACCOUNT)
+    await client.post("/categories/add", json={"name": "food"})
+
+async def test_delete_category_with_rollups(client):
+    await create_account(client)
+    assert (await client.post("/transactions/add", json=TRANSACTION)).status_code == 200
+
+    response = await client.delete("/categories/delete/1")
+    assert response.status_code == 200
+    assert (await client.get("/transactions/user/1/expense/All")).status_code == 404
+    assert (await client.delete("/categories/delete/1")).status_code == 404
+
+async def test_bulk_rejects_oversized_body(client, monkeypatch):
+    monkeypatch.setattr(router, "BULK_MAX_BYTES", 100)
+    assert (await client.post("/transactions/bulk", json=[TRANSACTION] * 3)).status_code == 413
+
+    # Без Content-Length тело обрывается при чтении
+    async def chunks():
+        for _ in range(3):
+            yield orjson.dumps(TRANSACTION) + b"\n"
+    response = await client.post("/transactions/bulk", content=chunks(),
+                                 headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 413
+
+async def test_bulk_rejects_too_many_items(client, monkeypatch):
+    monkeypatch.setattr(router, "BULK_MAX_ITEMS", 2)
+    assert (await client.post("/transactions/bulk", json=[TRANSACTION] * 3)).status_code == 413
+
+async def test_bulk_failure_reports_committed_rows(client, monkeypatch):
+    await create_account(client)
+    upsert_rollups = repository.upsert_rollups
+    calls = []
+
+    async def failing_upsert_rollups(session, rows):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+        await upsert_rollups(session, rows)
+
+    monkeypatch.setattr(repository, "upsert_rollups", failing_upsert_rollups)
+    response = await client.post("/transactions/bulk?chunk_size=1", json=[
+        {**TRANSACTION, "amount": "abc"}, TRANSACTION, TRANSACTION, TRANSACTION
+    ])
+    assert response.status_code == 500
+    detail = response.json()["detail"]
+    assert (detail["inserted"], detail["failed_index"]) == (1, 2)
+    assert [error["index"] for error in detail["errors"]] == [0]
+
+    [account] = (await client.get("/accounts/user/1")).json()
+    assert account["balance"] == 90
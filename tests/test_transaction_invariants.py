@@ -0,0 +1,178 @@
+import asyncio
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from hypothesis import HealthCheck, Phase, given, settings, strategies as st
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from budget_index import budget_index
+from cache import read_cache
+from database import Base, new_session, AccountOrm, BudgetOrm, TransactionRollupOrm
+from repository import (UserRepository, AccountRepository, CategoryRepository, BudgetRepository,
+                        TransactionRepository)
+from rollups import check_rollups
+from schemas import SUserAdd, SAccountAdd, SCategoryAdd, SBudgetAdd, STransactionAdd
+
+# Инварианты записи транзакций: после последовательности добавлений, изменений и удалений балансы счетов,
+# wasted бюджетов и transaction_rollups совпадают с пересчетом по модели транзакций в памяти.
+# Операции строит Hypothesis, поэтому найденная ошибка сокращается до минимальной последовательности.
+
+pytestmark = pytest.mark.anyio
+
+ACCOUNTS = 3
+CATEGORIES = 2
+INITIAL_BALANCE = Decimal("1000.00")
+START_DATE = date(2024, 1, 1)
+# Пересекающиеся бюджеты каждого счета: январь и первый квартал
+BUDGET_PERIODS = ((START_DATE, date(2024, 1, 31)), (START_DATE, date(2024, 3, 31)))
+
+amounts = st.integers(min_value=1, max_value=10000).map(lambda cents: Decimal(cents).scaleb(-2))
+days = st.integers(min_value=0, max_value=120).map(lambda offset: START_DATE + timedelta(days=offset))
+account_ids = st.integers(min_value=1, max_value=ACCOUNTS)
+category_ids = st.integers(min_value=1, max_value=CATEGORIES)
+
+transactions = st.builds(STransactionAdd, name=st.just("test"), description=st.just(""), amount=amounts, date=days,
+                         income=st.booleans(), account_id=account_ids, category_id=category_ids)
+# Изменение и удаление выбирают существующую транзакцию по номеру (по модулю их числа); изменение может
+# перенести транзакцию на другой счет, в другое окно бюджетов, сменить тип и категорию
+changes = st.fixed_dictionaries({"amount": amounts}, optional={
+    "account_id": account_ids, "date": days, "income": st.booleans(), "category_id": category_ids
+})
+operations = st.one_of(
+    st.tuples(st.just("add"), transactions),
+    st.tuples(st.just("update"), st.integers(min_value=0, max_value=100), changes),
+    st.tuples(st.just("delete"), st.integers(min_value=0, max_value=100)),
+)
+
+async def reset_database(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await read_cache.clear()
+    budget_index.clear()
+
+    await UserRepository.add_user(SUserAdd(name="owner", login="owner", email="owner@example.com",
+                                           password="secret", code="0000"))
+    for index in range(CATEGORIES):
+        await CategoryRepository.add_category(SCategoryAdd(name=f"category {index}"))
+    for index in range(ACCOUNTS):
+        await AccountRepository.add_account(SAccountAdd(name=f"account {index}", balance=INITIAL_BALANCE, user_id=1))
+        for start, end in BUDGET_PERIODS:
+            await BudgetRepository.add_budget(SBudgetAdd(name="budget", amount=1000, wasted=0, date=start,
+                                                         target_date=end, user_id=1, account_id=index + 1))
+
+# Транзакции, которые должны быть в базе: {id: STransactionAdd}
+class Ledger:
+    def __init__(self):
+        self.transactions = {}
+
+    def target(self, number: int):
+        ids = sorted(self.transactions)
+        return ids[number % len(ids)] if ids else None
+
+    # Операция с конкретной транзакцией: (вызов репозитория, применение результата к модели) или None
+    def resolve(self, operation: tuple):
+        if operation[0] == "add":
+            data = operation[1]
+
+            async def run():
+                transaction = await TransactionRepository.add_transaction(data)
+                self.transactions[transaction.id] = data
+            return None, run
+
+        transaction_id = self.target(operation[1])
+        if transaction_id is None:
+            return None
+        if operation[0] == "update":
+            data = STransactionAdd(**{**self.transactions[transaction_id].model_dump(), **operation[2]})
+
+            async def run():
+                await TransactionRepository.update_transaction(transaction_id, data)
+                self.transactions[transaction_id] = data
+            return transaction_id, run
+
+        async def run():
+            await TransactionRepository.delete_transaction_by_id(transaction_id)
+            del self.transactions[transaction_id]
+        return transaction_id, run
+
+    def balances(self) -> dict:
+        balances = {account_id: INITIAL_BALANCE for account_id in range(1, ACCOUNTS + 1)}
+        for data in self.transactions.values():
+            balances[data.account_id] += data.amount if data.income else -data.amount
+        return balances
+
+    def wasted(self) -> list:
+        return [
+            sum((data.amount for data in self.transactions.values()
+                 if data.account_id == account_id and not data.income and start <= data.date <= end), Decimal("0.00"))
+            for account_id in range(1, ACCOUNTS + 1) for start, end in BUDGET_PERIODS
+        ]
+
+    def rollups(self) -> dict:
+        rollups = {}
+        for data in self.transactions.values():
+            key = (1, data.income, data.date, data.category_id)
+            total, count = rollups.get(key, (Decimal("0.00"), 0))
+            rollups[key] = (total + data.amount, count + 1)
+        return rollups
+
+async def assert_matches(ledger: Ledger):
+    async with new_session() as session:
+        balances = dict((await session.execute(select(AccountOrm.id, AccountOrm.balance))).all())
+        wasted = (await session.execute(select(BudgetOrm.wasted).order_by(BudgetOrm.id))).scalars().all()
+        rollups = {
+            (rollup.user_id, rollup.income, rollup.day, rollup.category_id): (rollup.total, rollup.count)
+            for rollup in (await session.execute(
+                select(TransactionRollupOrm).where(TransactionRollupOrm.count > 0)
+            )).scalars()
+        }
+    assert balances == ledger.balances()
+    assert wasted == ledger.wasted()
+    assert rollups == ledger.rollups()
+    assert await check_rollups() == []
+
+# Пример Hypothesis сам пересоздает базу, поэтому общая на тест фикстура engine допустима.
+# Фаза explain пропускается: на каждом примере с базой она занимает минуты
+EXAMPLES = settings(max_examples=30, deadline=None, derandomize=True,
+                    phases=[Phase.explicit, Phase.reuse, Phase.generate, Phase.shrink],
+                    suppress_health_check=[HealthCheck.function_scoped_fixture])
+
+@EXAMPLES
+@given(operation_list=st.lists(operations, max_size=40))
+async def test_sequential_operations_match_model(engine, operation_list):
+    await reset_database(engine)
+    ledger = Ledger()
+    for operation in operation_list:
+        resolved = ledger.resolve(operation)
+        if resolved is not None:
+            await resolved[1]()
+    await assert_matches(ledger)
+
+# Чередование: Hypothesis делит операции на группы, операции группы выполняются одновременно в разных сессиях.
+# В группе не больше одной операции над каждой транзакцией, иначе исход зависит от порядка.
+# Операция, отклоненная блокировкой SQLite, откатывается целиком и в модель не попадает.
+@EXAMPLES
+@given(data=st.data())
+async def test_concurrent_operations_match_model(engine, data):
+    await reset_database(engine)
+    ledger = Ledger()
+    operation_list = data.draw(st.lists(operations, max_size=40), label="operations")
+    position = 0
+    while position < len(operation_list):
+        size = data.draw(st.integers(min_value=1, max_value=6), label="group size")
+        group, targets = [], set()
+        for operation in operation_list[position:position + size]:
+            resolved = ledger.resolve(operation)
+            if resolved is None or (resolved[0] is not None and resolved[0] in targets):
+                continue
+            targets.add(resolved[0])
+            group.append(resolved[1])
+        position += size
+
+        for result in await asyncio.gather(*(run() for run in group), return_exceptions=True):
+            if isinstance(result, Exception) and not isinstance(result, OperationalError):
+                raise result
+    await assert_matches(ledger)